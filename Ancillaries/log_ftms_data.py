@@ -1,46 +1,21 @@
 import asyncio
 import json
-import time
+import os
+import sys
 from datetime import datetime
 from bleak import BleakScanner, BleakClient
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ftms_data import parse_treadmill_data  # noqa: E402
+
 FTMS_SERVICE_UUID = "00001826-0000-1000-8000-00805f9b34fb"
 TREADMILL_DATA_UUID = "00002ACD-0000-1000-8000-00805f9b34fb"
 
 log_file = "treadmill_log.json"
 log_data = []
 
-def parse_treadmill_data(data: bytearray):
-    flags = int.from_bytes(data[0:2], byteorder='little')
-    idx = 2
-
-    speed = distance = elapsed_time = incline = None
-
-    if flags & 0x01:  # Bit 0 = speed present
-        speed = int.from_bytes(data[idx:idx+2], 'little') / 100.0
-        idx += 2
-
-    if flags & 0x04:  # Bit 2 = distance present
-        distance = int.from_bytes(data[idx:idx+3], 'little') / 1000.0
-        idx += 3
-
-    if flags & 0x08:  # Bit 3 = incline present
-        incline = int.from_bytes(data[idx:idx+2], 'little', signed=True) / 10.0
-        idx += 2
-
-    if flags & 0x0400:  # Bit 10 = elapsed time present
-        elapsed_time = int.from_bytes(data[idx:idx+3], 'little')
-        idx += 3
-
-    return {
-        "speed_kmh": speed,
-        "distance_km": distance,
-        "incline_percent": incline,
-        "elapsed_time_s": elapsed_time,
-    }
-
 def notification_handler(_, data: bytearray):
-    parsed = parse_treadmill_data(data)
+    parsed = parse_treadmill_data(data).as_dict()
     entry = {
         "timestamp": datetime.now().isoformat(),
         "raw": data.hex(),
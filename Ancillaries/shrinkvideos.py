@@ -1,14 +1,19 @@
 import cv2
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from video_decoder import open_decoder  # noqa: E402
 
 def convert_video(input_path, output_path, width=640, height=380, codec='MJPG', fps=30):
-    # Open the input video
-    cap = cv2.VideoCapture(input_path)
+    # Open the input video; the decoder does the resize
+    cap = open_decoder(input_path, size=(width, height))
     if not cap.isOpened():
         print("Error: Cannot open the video file.")
         return
 
     # Get the original frame rate if available
-    original_fps = cap.get(cv2.CAP_PROP_FPS)
+    original_fps = cap.fps
     if original_fps > 0:
         fps = min(fps, original_fps)
 
@@ -16,16 +21,14 @@ def convert_video(input_path, output_path, width=640, height=380, codec='MJPG',
     fourcc = cv2.VideoWriter_fourcc(*codec)
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
+    frame = None
     while True:
-        ret, frame = cap.read()
+        ret, frame = cap.read(frame)
         if not ret:
             break
 
-        # Resize the frame
-        resized_frame = cv2.resize(frame, (width, height))
-
         # Write the frame to the output video
-        out.write(resized_frame)
+        out.write(frame)
 
     # Release everything
     cap.release()
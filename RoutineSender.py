@@ -10,6 +10,11 @@ from post_workout_stats import show_post_workout_stats
 from RunRoutine import exercise_routine
 from zwo_parser import load_all_zwo_routines
 from menu_ui import run_selection_ui
+from route_data import compile_all_routes
+from video_decoder import open_decoder
+from video_playback import get_screen_resolution
+from video_playlist import VideoWarmup
+from session_log import last_runs_by_routine
 
 # Constants
 WHITE = (255, 255, 255)
@@ -105,6 +110,9 @@ async def main():
     show_status(screen, font, "Generating thumbnails...")
     run_thumbnail_generators()
 
+    show_status(screen, font, "Compiling route data...")
+    compile_all_routes('videos')
+
     show_status(screen, font, "Loading routines...")
     json_routines = load_routines('routines.json')
     zwo_routines = load_all_zwo_routines('routines', zwo_speed)  # should return {name: {"type": ..., "segments": [...]}}
@@ -114,9 +122,19 @@ async def main():
     videos = list_videos('videos')
     video_data = [(v[0], f"{v[1].capitalize()} ({v[2]} km/h {v[3]}km)") for v in videos]
 
-    routine_name, video_path, selected_speed = run_selection_ui(screen, routines, video_data, zwo_speed, pb_times=pb_times)
+    warmup = None
+    warmup_config = user_config.get("video_warmup", {})
+    if warmup_config.get("enabled", True):
+        native_size = get_screen_resolution()
+        warmup = VideoWarmup(lambda path: open_decoder(path, native_size=native_size))
+
+    routine_name, video_path, selected_speed, replay_tcx = run_selection_ui(
+        screen, routines, video_data, zwo_speed, pb_times=pb_times, warmup=warmup, last_runs=last_runs_by_routine()
+    )
 
     if not all([routine_name, video_path, selected_speed]):
+        if warmup is not None:
+            warmup.discard()
         pygame.quit()
         return
 
@@ -135,7 +153,10 @@ async def main():
         selected_speed,
         routine_type,
         [(d, selected_speed + inc) for d, inc in routine_segments],
-        str(video_path)
+        str(video_path),
+        warmup=warmup,
+        routine_name=routine_name,
+        replay_tcx=replay_tcx
     )
 
     if result:
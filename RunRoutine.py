@@ -2,40 +2,33 @@ import asyncio
 import os
 import json
 from datetime import datetime
-from treadmill_control import TreadmillControl, parse_treadmill_data
+from treadmill_control import TreadmillControl
+from ftms_data import parse_treadmill_data
+from control_scheduler import ControlPointScheduler
+from connection_supervisor import ConnectionSupervisor
+from ble_ingest import IngestPipeline
 from video_playback import play_video
-from virtual_competitors import generate_competitors_with_profiles
+from video_decoder import probe_frame_count
+from route_data import load_route_for_playlist
+from video_playlist import build_playlist
+from incline_follower import InclineFollower
+from playback_trace import trace_from_config
+from ghost_profile import GhostProfile
+from ghost_cache import cached_competitors, cached_race_field, new_seed
+from ghost_ticker import GhostSnapshot, GhostTicker
+from motion_estimator import MotionEstimator
+from tcx_ghosts import load_tcx_ghost, replay_ghost_name
+from session_log import record_session, session_for_tcx
 from tcx_incremental import (
     start_tcx_file,
     start_new_lap,
     append_tcx_trackpoint,
     finalize_lap,
-    finalize_tcx_file
+    finalize_tcx_file,
+    mark_track_gap
 )
 
-def simulate_ghost_distance(speed_profile, elapsed_seconds):
-    distance = 0.0
-    for i in range(len(speed_profile)):
-        t_start, speed = speed_profile[i]
-        t_end = speed_profile[i + 1][0] if i + 1 < len(speed_profile) else float('inf')
-        if elapsed_seconds < t_start:
-            break
-        duration = min(elapsed_seconds, t_end) - t_start
-        distance += (speed * (duration / 3600))  # km/h * hours = km
-        if elapsed_seconds < t_end:
-            break
-    return distance * 1000  # meters
-
-def get_current_ghost_speed(speed_profile, elapsed_seconds):
-    for i in range(len(speed_profile) - 1):
-        t0, s0 = speed_profile[i]
-        t1, s1 = speed_profile[i + 1]
-        if t0 <= elapsed_seconds < t1:
-            ratio = (elapsed_seconds - t0) / (t1 - t0)
-            return s0 + ratio * (s1 - s0)
-    return speed_profile[-1][1]
-
-async def exercise_routine(initial_speed, routine_type, routine, video_path):
+async def exercise_routine(initial_speed, routine_type, routine, video_path, warmup=None, routine_name=None, replay_tcx=None, ghost_seed=None):
     def load_user_config(config_path='user_config.json'):
         try:
             with open(config_path, 'r') as f:
@@ -56,9 +49,34 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
     await distance_queue.put(0.0)
     elapsed_time_queue = asyncio.Queue(maxsize=1)
     heart_rate_queue = asyncio.Queue(maxsize=1)
-    ghost_gap_queue = asyncio.Queue(maxsize=1)
+    ghost_snapshot = GhostSnapshot()
+    motion = MotionEstimator()  # Shared, fed straight from treadmill samples
     exit_signal = asyncio.Queue(maxsize=1)
 
+    user_config = load_user_config()
+
+    # From here on speed/incline writes go through one scheduler task with a latest-wins mailbox
+    control_scheduler = ControlPointScheduler(treadmill, min_spacing=user_config.get("control_min_spacing_s", 0.2))
+    treadmill.scheduler = control_scheduler
+    control_scheduler.start()
+
+    distance_locked = user_config.get("distance_locked_playback", False)
+    incline_config = user_config.get("video_incline", {})
+
+    # A loop or chain of clips long enough for the whole workout
+    workout_km = sum(duration if routine_type != "time" else speed * duration / 60 for duration, speed in routine)
+    playlist = build_playlist(video_path, user_config.get("video_playlist", {}), workout_km)
+    if len(playlist) > 1:
+        print(f"[INFO] Playlist of {len(playlist)} clips: {', '.join(os.path.basename(p) for p in playlist)}")
+    stop_video = asyncio.Event()
+
+    # Whenever the clips have route CSVs: TCX positions use it even with both features below off
+    route = load_route_for_playlist(playlist, frame_count=probe_frame_count)
+    if route is None and (distance_locked or incline_config.get("enabled", False)):
+        print("[INFO] No route data for this video; using speed-ratio playback and fixed incline.")
+
+    trace, trace_path = trace_from_config(user_config, datetime.utcnow())
+
     print("[INFO] Launching video playback...")
     video_task = asyncio.create_task(
         play_video(
@@ -67,9 +85,17 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
             speed_queue,
             distance_queue,
             elapsed_time_queue,
-            ghost_gap_queue,
+            ghost_snapshot,
             heart_rate_queue,  # ✅ Add this
-            exit_signal
+            exit_signal,
+            route=route if distance_locked else None,
+            trace=trace,
+            trace_path=trace_path,
+            adaptive_quality=user_config.get("adaptive_playback_quality", True),
+            playlist=playlist,
+            stop_event=stop_video,
+            warm_start=warmup.take(playlist[0]) if warmup is not None else None,
+            motion=motion
         )
     )
 
@@ -84,12 +110,18 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
     await treadmill.set_speed(initial_speed)
     await treadmill.set_incline(1.0)
 
+    incline_task = None
+    if route is not None and incline_config.get("enabled", False):
+        incline_follower = InclineFollower.from_config(
+            route, treadmill, lambda: motion.distance_at() / 1000, incline_config
+        )
+        incline_task = asyncio.create_task(incline_follower.run())
+
     start_time = datetime.utcnow()
     total_minutes = sum(duration for duration, _ in routine)
     total_distance_km = sum(inc * duration / 60 for duration, inc in routine)
     avg_speed = total_distance_km / (total_minutes / 60)
 
-    user_config = load_user_config()
     use_video_filename_speed = user_config.get("use_video_filename_speed", False)
 
     # Extract speed from video filename
@@ -115,7 +147,25 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
             selected_key = str(key)
             break
 
-    ghost_runners = generate_competitors_with_profiles(total_minutes, avg_speed)
+    # Same seed, same opponents: racing a recorded session reuses its seed unless one is given
+    seed = ghost_seed if ghost_seed is not None else user_config.get("ghost_seed")
+    if seed is None and replay_tcx:
+        seed = (session_for_tcx(replay_tcx) or {}).get("seed")
+    # A fresh seed is only ever seen again through a replay, which regenerates and caches it then
+    reusable_seed = seed is not None
+    if seed is None:
+        seed = new_seed()
+    print(f"[INFO] Ghost seed: {seed}")
+
+    # A mass-start field replaces the handful of generated ghosts; its nearest runners are shown instead
+    race_field = None
+    field_config = user_config.get("race_field", {})
+    if field_config.get("enabled", False) and workout_km:
+        race_field = cached_race_field(routine_name, workout_km, seed, field_config, store=reusable_seed)
+        print(f"[INFO] Race field of {race_field.size} runners over {workout_km:.2f} km")
+        ghost_runners = []
+    else:
+        ghost_runners = cached_competitors(routine_name, total_minutes, avg_speed, seed, store=reusable_seed)
 
     for label, source in [("PB", pb_times), ("Goal", goal_times)]:
         minutes = source.get(selected_key)
@@ -124,66 +174,86 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
             speed = distance_km / (minutes / 60)
             ghost_runners.append({
                 "base_name": f"{label} {selected_key}km",
-                "speed_profile": [(0, speed)]
+                "speed_profile": [(0, speed)],
+                "profile": GhostProfile([(0, speed)])
             })
 
+    # Recorded runs raced second by second: the menu's "last run" plus any files listed in user_config
+    replays = [("Last run", replay_tcx)] if replay_tcx else []
+    replays += [(replay_ghost_name(path), path) for path in user_config.get("replay_ghosts", []) if path != replay_tcx]
+    for name, tcx_path in replays:
+        profile = load_tcx_ghost(tcx_path)
+        if profile is not None:
+            ghost_runners.append({"base_name": name, "profile": profile})
+
     print(f"[DEBUG] Selected key: {selected_key}")
     print(f"[DEBUG] PB time: {pb_times.get(selected_key)} min")
     print(f"[DEBUG] Goal time: {goal_times.get(selected_key)} min")
     print(f"[DEBUG] Ghost runners: {[g['base_name'] for g in ghost_runners]}")
 
-    start_tcx_file(start_time)
+    tcx_path = start_tcx_file(start_time, route=route)
 
-    loop = asyncio.get_event_loop()
-    last_logged_distance = None
     last_distance = 0.0
 
-    def callback(sender, data):
-        nonlocal last_logged_distance, last_distance
-
-        speed, distance, incline, elapsed_time, heart_rate = parse_treadmill_data(data, hr_value=treadmill.latest_hr)
-        if incline is None: incline = 0.0
-        if speed is None: speed = 0.0
-        if distance is None: distance = 0.0
-        if elapsed_time is None: elapsed_time = 0.0
-        shared_state["elapsed_time"] = elapsed_time
-        shared_state["distance"] = distance
-
-        def safe_put(q, val):
-            try: q.get_nowait()
-            except asyncio.QueueEmpty: pass
-            try: q.put_nowait(val)
-            except asyncio.QueueFull: pass
-
-        loop.call_soon_threadsafe(safe_put, speed_ratio_queue, speed / baseline_speed if baseline_speed > 0 else 1.0)
-        loop.call_soon_threadsafe(safe_put, speed_queue, speed)
-        loop.call_soon_threadsafe(safe_put, distance_queue, distance)
-        loop.call_soon_threadsafe(safe_put, elapsed_time_queue, elapsed_time)
-        loop.call_soon_threadsafe(safe_put, heart_rate_queue, heart_rate)
-
-
-        timestamp = datetime.utcnow()
-        append_tcx_trackpoint(timestamp, speed, distance, incline, heart_rate)
-        last_distance = distance
-
-        elapsed = (timestamp - start_time).total_seconds()
-        user_distance_m = distance * 1000
-        distance_rounded = round(user_distance_m, 1)
-
-        if last_logged_distance != distance_rounded:
-            last_logged_distance = distance_rounded
-            ghost_gaps = {}
-            for ghost in ghost_runners:
-                ghost_distance_m = simulate_ghost_distance(ghost["speed_profile"], elapsed)
-                current_speed = get_current_ghost_speed(ghost["speed_profile"], elapsed)
-                ghost_name = f"{ghost['base_name']} ({current_speed:.1f} km/h)"
-                gap = user_distance_m - ghost_distance_m
-                ghost_gaps[ghost_name] = gap
-            loop.call_soon_threadsafe(ghost_gap_queue.put_nowait, ghost_gaps)
+    # Ghosts are evaluated on their own fixed-rate task; the treadmill samples only update the user side
+    ghost_ticker = GhostTicker(ghost_runners, race_field, rate_hz=user_config.get("ghost_tick_hz", 10.0),
+                               motion=motion, snapshot=ghost_snapshot)
+    ghost_ticker.start()
+    ghost_task = asyncio.create_task(ghost_ticker.run())
+
+    # Notices a stalled or dropped link and reconnects in the background; motion coasts meanwhile
+    supervisor = ConnectionSupervisor(
+        treadmill,
+        motion=motion,
+        stall_timeout=user_config.get("link_stall_timeout_s", 5.0),
+        max_outage=user_config.get("link_max_outage_s", 300.0),
+        on_reconnect=mark_track_gap
+    )
+
+    def safe_put(q, val):
+        try: q.get_nowait()
+        except asyncio.QueueEmpty: pass
+        try: q.put_nowait(val)
+        except asyncio.QueueFull: pass
+
+    # The BLE callback only stamps and enqueues raw packets; parsing and these stages run on the loop
+    ingest = IngestPipeline(parse_treadmill_data, maxlen=user_config.get("ingest_queue_size", 256))
+
+    def update_state(sample, timestamp, received):
+        # Segment progress, the ghosts' and video's motion estimate, and link liveness
+        shared_state["elapsed_time"] = sample.elapsed_time_s or 0.0
+        shared_state["distance"] = sample.distance_km or 0.0
+        motion.update(sample.distance_km, sample.speed_kmh, now=received)
+        supervisor.sample_received(received)
+
+    def publish_ui(sample, timestamp, received):
+        speed = sample.speed_kmh or 0.0
+        safe_put(speed_ratio_queue, speed / baseline_speed if baseline_speed > 0 else 1.0)
+        safe_put(speed_queue, speed)
+        safe_put(distance_queue, sample.distance_km or 0.0)
+        safe_put(elapsed_time_queue, sample.elapsed_time_s or 0.0)
+        safe_put(heart_rate_queue, sample.heart_rate_bpm or treadmill.latest_hr)  # Treadmills without a receiver report 0
+
+    recording = True  # Cleared at workout end; samples keep driving the video until it has stopped
+
+    def record(sample, timestamp, received):
+        nonlocal last_distance
+        if not recording:
+            return
+        append_tcx_trackpoint(timestamp, sample.speed_kmh or 0.0, sample.distance_km or 0.0,
+                              sample.incline_percent or 0.0, sample.heart_rate_bpm or treadmill.latest_hr)
+        last_distance = sample.distance_km or 0.0
+
+    ingest.add_stage("state", update_state)
+    ingest.add_stage("ui", publish_ui)
+    ingest.add_stage("record", record)
+    ingest_task = ingest.start()
 
     print("[INFO] Starting treadmill monitoring...")
-    await treadmill.start_monitoring(callback)
+    await treadmill.start_monitoring(ingest.push)
+    supervisor_task = asyncio.create_task(supervisor.run())
 
+    lap_open = False
     try:
         print("[INFO] Starting routine segments...")
         for idx, (duration, speed_increment) in enumerate(routine):
@@ -193,6 +263,7 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
             lap_start_time = datetime.utcnow()
             lap_start_distance = shared_state["distance"]
             start_new_lap(lap_start_time, lap_start_distance)
+            lap_open = True
 
             if routine_type == "time":
                 segment_start = shared_state["elapsed_time"]
@@ -209,6 +280,9 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
                 if not exit_signal.empty():
                     print("[INFO] User exit detected.")
                     raise asyncio.CancelledError("User requested exit")
+                if supervisor.gave_up.is_set():
+                    print("[INFO] Treadmill connection could not be restored.")
+                    raise asyncio.CancelledError("Treadmill link lost")
                 if current >= target:
                     print("[SEGMENT] Segment complete.")
                     break
@@ -216,15 +290,42 @@ async def exercise_routine(initial_speed, routine_type, routine, video_path):
             lap_end_time = datetime.utcnow()
             lap_end_distance = shared_state["distance"]
             finalize_lap(lap_end_time, lap_end_distance)
+            lap_open = False
 
     except asyncio.CancelledError:
         print("[INFO] Workout interrupted by user.")
     finally:
         print("[INFO] Cleaning up...")
+        ingest.drain()  # Samples that arrived before the end still belong in the TCX
+        recording = False
+        if lap_open:
+            # Exited mid-segment: close the lap so the TCX stays well-formed
+            finalize_lap(datetime.utcnow(), shared_state["distance"])
+        if incline_task:
+            incline_task.cancel()
+        await control_scheduler.stop()
+        treadmill.scheduler = None
+        print(f"[CONTROL] Control point stats: {control_scheduler.stats()}")
+        # Don't keep the runner waiting for the rest of the playlist, or for a distance-locked
+        # video that only moves while the belt does
+        if len(playlist) > 1 or (distance_locked and route is not None):
+            stop_video.set()
         await video_task
+
+        # Only now: a distance-locked video needs live samples (and the ghosts) until it has stopped
+        ghost_task.cancel()
+        supervisor_task.cancel()
+        ingest_task.cancel()
+        print(f"[INGEST] BLE ingest stats: {ingest.stats()}")
+        if supervisor.outages or supervisor.hr_outages:
+            print(f"[LINK] Connection stats: {supervisor.stats()}")
         end_time = datetime.utcnow()
         final_distance = last_distance
         finalize_tcx_file()
+        # Only sessions that can be raced again are offered as "last run"
+        if load_tcx_ghost(tcx_path) is not None:
+            record_session(tcx_path, routine_name, video_path, start_time, final_distance, seed=seed,
+                           field_size=race_field.size if race_field is not None else len(ghost_runners))
 
         print("[INFO] Workout complete.")
         return {
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+
+class IngestPipeline:
+    """
+    The hand-off from the BLE delivery context to the asyncio loop.
+
+    push() is all the bleak callback does: it stamps the raw packet with
+    time.monotonic() and the wall time, appends it to a bounded deque (an
+    atomic append, so no lock) and wakes the loop at most once per batch.
+    run() drains the deque on the loop, parses each packet once and passes
+    the sample through the stages in order; a stage that raises is counted
+    and skipped without holding up the ones after it. The stages run one
+    after another in this one task on purpose: each is a few microseconds of
+    work that must see samples in order, so separate consumer tasks would
+    only add queue hops. drain() can also be called directly to flush what
+    is still queued, e.g. at workout end before recording stops. If the loop falls
+    behind, the oldest packets are dropped rather than letting memory grow,
+    and stats() reports drops, queue depth, ingest lag and per-stage time.
+    """
+
+    def __init__(self, parse, maxlen=256, latency_window=500):
+        self.parse = parse
+        self.packets = deque(maxlen=maxlen)
+        self.stages = []  # [name, stage, calls, errors, total_s, max_s]
+        self.loop = None
+        self.wakeup = asyncio.Event()
+        self.wake_pending = False
+
+        # Metrics
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.parse_errors = 0
+        self.max_depth = 0
+        self.lags = deque(maxlen=latency_window)
+
+    def add_stage(self, name, stage):
+        """stage(sample, timestamp, received) runs on the loop for every parsed packet."""
+        self.stages.append([name, stage, 0, 0, 0.0, 0.0])
+
+    def push(self, sender, data):
+        # Called from the BLE delivery context: stamp, enqueue, wake. Nothing else.
+        received = time.monotonic()
+        if len(self.packets) == self.packets.maxlen:
+            self.dropped += 1
+        self.packets.append((received, datetime.utcnow(), bytes(data)))
+        self.received += 1
+        self.max_depth = max(self.max_depth, len(self.packets))
+        if not self.wake_pending:
+            self.wake_pending = True
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            self.wake_pending = False
+            self.drain()
+
+    def drain(self):
+        while self.packets:
+            self.process(*self.packets.popleft())
+
+    def process(self, received, timestamp, data):
+        try:
+            sample = self.parse(data)
+        except Exception as e:
+            self.parse_errors += 1
+            print(f"[INGEST] Unparseable packet {data.hex()}: {e}")
+            return
+        for entry in self.stages:
+            start = time.perf_counter()
+            try:
+                entry[1](sample, timestamp, received)
+            except Exception as e:
+                entry[3] += 1
+                print(f"[INGEST] Stage '{entry[0]}' failed: {e}")
+            took = time.perf_counter() - start
+            entry[2] += 1
+            entry[4] += took
+            entry[5] = max(entry[5], took)
+        self.processed += 1
+        self.lags.append(time.monotonic() - received)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        return asyncio.create_task(self.run())
+
+    def stats(self):
+        stats = {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "parse_errors": self.parse_errors,
+            "max_depth": self.max_depth,
+        }
+        if self.lags:
+            p50, p95 = np.percentile(self.lags, [50, 95])
+            stats.update(lag_p50_ms=round(float(p50) * 1000, 2), lag_p95_ms=round(float(p95) * 1000, 2),
+                         lag_max_ms=round(max(self.lags) * 1000, 2))
+        for name, _, calls, errors, total_s, max_s in self.stages:
+            if calls:
+                stats[f"{name}_avg_ms"] = round(total_s / calls * 1000, 3)
+                stats[f"{name}_max_ms"] = round(max_s * 1000, 3)
+            if errors:
+                stats[f"{name}_errors"] = errors
+        return stats
@@ -0,0 +1,52 @@
+"""
+Ordering check for ControlPointScheduler against a fake treadmill.
+
+Queues speed and incline changes, then a stop while they are still unsent,
+and fails if:
+
+  - anything other than the stop reaches the control point, or
+  - a caller whose speed/incline was dropped is left waiting or gets a
+    result other than the stop's, or
+  - a speed issued after the stop is not sent after it.
+
+    python check_control_scheduler.py
+"""
+import asyncio
+
+from control_scheduler import ControlPointScheduler
+from treadmill_control import ControlOpCode, ResultCode
+
+
+class FakeTreadmill:
+    def __init__(self):
+        self.written = []
+
+    async def send_command(self, op_code, payload=b""):
+        self.written.append(ControlOpCode(op_code))
+        await asyncio.sleep(0.01)
+        return ResultCode.SUCCESS
+
+
+async def run_check():
+    treadmill = FakeTreadmill()
+    scheduler = ControlPointScheduler(treadmill, min_spacing=0.0)
+    try:
+        speed = scheduler.submit(ControlOpCode.SET_TARGET_SPEED, b"\x10\x03")
+        incline = scheduler.submit(ControlOpCode.SET_TARGET_INCLINE, b"\x14\x00")
+        stop = scheduler.submit(ControlOpCode.STOP_OR_PAUSE, b"\x01")
+        scheduler.start()
+        results = await asyncio.wait_for(asyncio.gather(speed, incline, stop), timeout=1.0)
+        assert treadmill.written == [ControlOpCode.STOP_OR_PAUSE], f"sent {treadmill.written} after a stop"
+        assert all(result == ResultCode.SUCCESS for result in results), f"dropped callers got {results}"
+
+        restart = scheduler.submit(ControlOpCode.SET_TARGET_SPEED, b"\x10\x03")
+        await asyncio.wait_for(restart, timeout=1.0)
+        assert treadmill.written[-1] == ControlOpCode.SET_TARGET_SPEED, "a speed issued after the stop was lost"
+    finally:
+        await scheduler.stop()
+    print(f"[CONTROL] Written: {[op.name for op in treadmill.written]}; stats {scheduler.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_check())
+    print("[CONTROL] OK: a stop drops the speed and incline queued before it")
@@ -0,0 +1,129 @@
+"""
+Steady-state allocation check for the video render path.
+
+Runs play_video's per-frame path under tracemalloc: the real FramePrefetcher
+worker decoding from a synthetic capture into its slot pool (including the
+reduced-size decode and upscale with --render-scale 0.5), then compose_frame()
+(HUD tiles, ghost sprites, exit dialog) on each frame it hands over, and
+fails if, once warmed up:
+
+  - memory grows across frames by more than growth_limit_bytes (measured: up
+    to 256 B over 300 frames, the float timings and tuples the last frame still
+    holds), or
+  - the transient peak above the warmed-up baseline exceeds peak_limit_bytes.
+
+Not a single numpy or frame-sized buffer is allocated per frame; the peak
+allowance exists because CPython still builds the HUD label strings, the
+argument tuples and the deque entries passed between the threads for every
+frame, small objects that are freed straight away (measured: ~1.4 KB).
+The warm-up runs past frame 256 so the frame indices are no longer cached
+small ints when the baseline is taken.
+Anything buffer-sized trips it: a 1280x720 frame is 2.7 MB, the smallest
+sprite tile ~18 KB.
+
+Not covered: OpenCV's own native allocations (cv2.resize, cv2.multiply, ...),
+which tracemalloc cannot see, and cv2.imshow/waitKey, which need a display.
+
+    python check_frame_allocations.py [--frames 300] [--width 1280 --height 720] [--render-scale 0.5]
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from frame_prefetcher import FramePrefetcher
+from ghost_runner_hud import GhostRunnerHUD
+from hud_layers import HudCompositor, ExitDialog
+from video_playback import compose_frame, split_ghost_labels
+
+
+class SyntheticCapture:
+    # Behaves like cv2.VideoCapture.read(image): fills the caller's buffer when it fits
+    def __init__(self, size=(1920, 1080)):
+        self.source = np.random.randint(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+        self.scaled = self.source
+
+    def set_output_size(self, size):
+        width, height = size
+        self.scaled = np.ascontiguousarray(cv2.resize(self.source, (width, height)))
+
+    def read(self, image=None):
+        if image is None or image.shape != self.scaled.shape:
+            image = np.empty_like(self.scaled)
+        np.copyto(image, self.scaled)
+        return True, image
+
+    def grab(self):
+        return True
+
+    def release(self):
+        pass
+
+
+def run_check(width=1280, height=720, frames=300, warmup=300, render_scale=1.0, growth_limit_bytes=512,
+              peak_limit_bytes=2048, ghost_gaps=None):
+    prefetcher = FramePrefetcher(SyntheticCapture(), (width, height))
+    prefetcher.set_quality(cv2.INTER_NEAREST if render_scale < 1.0 else cv2.INTER_LINEAR, render_scale, 1)
+    hud = HudCompositor()
+    exit_dialog = ExitDialog()
+    ghost_runner_hud = GhostRunnerHUD()
+    if ghost_gaps is None:
+        ghost_gaps = {"Ghost A (10.1 km/h)": -35.0, "Ghost B (10.6 km/h)": 12.5, "Ghost C (9.8 km/h)": -120.0,
+                      "PB 5km (9.3 km/h)": -210.0, "Goal 5km (10.0 km/h)": 4.0}
+    left_labels, right_labels = split_ghost_labels(ghost_gaps)
+
+    def present(count):
+        shown = 0
+        while shown < count:
+            item = prefetcher.get_nowait()
+            if item is None:
+                time.sleep(0.0005)
+                continue
+            frame = item[1]
+            compose_frame(frame, hud, ghost_runner_hud, exit_dialog, 10.3, 152, 2.47, 754.0,
+                          left_labels, right_labels, None, ghost_gaps, True)
+            prefetcher.release(frame)
+            shown += 1
+
+    def settle():
+        # Measure with the ready queue full and the worker parked, so queued entries don't count as growth
+        while len(prefetcher.frames) < prefetcher.buffer_size:
+            time.sleep(0.001)
+        time.sleep(0.01)
+
+    tracemalloc.start()
+    prefetcher.start()
+    try:
+        present(warmup)
+        settle()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        present(frames)
+        settle()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        prefetcher.close()
+
+    growth = current - baseline
+    peak_per_frame = peak - baseline
+    print(f"[ALLOC] {frames} frames at {width}x{height} (render scale {render_scale}): "
+          f"net growth {growth} B, peak above baseline {peak_per_frame} B")
+    assert growth <= growth_limit_bytes, f"render path leaked {growth} bytes over {frames} frames"
+    assert peak_per_frame <= peak_limit_bytes, f"a frame allocated {peak_per_frame} bytes (frame is {width * height * 3} bytes)"
+    return growth, peak_per_frame
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--render-scale", type=float, default=None,
+                        help="only this render scale (default: both 1.0 and 0.5)")
+    args = parser.parse_args()
+    for scale in [args.render_scale] if args.render_scale else [1.0, 0.5]:
+        run_check(args.width, args.height, args.frames, render_scale=scale)
+    print("[ALLOC] OK: no buffer-sized per-frame allocations and no growth in the steady state")
@@ -0,0 +1,58 @@
+"""
+Consistency check for routes joined across playlist clips.
+
+Builds a synthetic two-clip playlist route whose video frame counts differ
+from the route row counts (as concatenate_routes does for real clips) and
+fails if, anywhere from the start to the final distance:
+
+  - position_for_distance or InclineFollower.target_for_distance raises, or
+  - a lookup inside the second clip reads a row from the first clip.
+
+    python check_playlist_route.py [--rows 1000] [--frames 1200]
+"""
+import argparse
+
+import numpy as np
+
+from incline_follower import InclineFollower
+from route_data import RouteData, concatenate_routes
+
+
+def synthetic_clip(rows, distance_m, lat, incline):
+    frame = np.arange(rows, dtype=np.int64)
+    return RouteData(frame, np.full(rows, lat), np.zeros(rows), np.zeros(rows), np.full(rows, incline),
+                     np.linspace(0.0, distance_m, rows))
+
+
+def run_check(rows=1000, frames=1200, distance_m=5000.0, step_m=10.0):
+    # Clip 2 is told apart from clip 1 by its latitude and incline
+    first = synthetic_clip(rows, distance_m, 1.0, 2.0)
+    second = synthetic_clip(rows, distance_m, 2.0, 6.0)
+    route = concatenate_routes([first, second], frame_counts=[frames, frames])
+    follower = InclineFollower(route, None, lambda: 0.0, lookahead_m=0.0, window_m=step_m,
+                               min_incline=0.0, max_incline=10.0)
+
+    checked = 0
+    for distance in np.arange(0.0, route.total_distance_m + step_m, step_m):
+        lat, _ = route.position_for_distance(distance)
+        incline = follower.target_for_distance(distance)
+        if distance > distance_m + step_m:
+            assert lat == 2.0, f"position at {distance:.0f} m came from clip 1"
+            assert incline == 6.0, f"incline at {distance:.0f} m came from clip 1 ({incline})"
+        checked += 1
+
+    lat, _ = route.position_for_distance(route.total_distance_m)
+    assert lat == 2.0, "final position did not come from the last clip"
+    print(f"[ROUTE] {checked} lookups over {route.total_distance_m:.0f} m, "
+          f"{route.frame_count} rows for {2 * frames} video frames")
+    return checked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=1200)
+    args = parser.parse_args()
+    run_check(args.rows, args.frames)
+    run_check(args.frames, args.rows)
+    print("[ROUTE] OK: every lookup maps to a row of the clip it falls in")
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+
+class ConnectionSupervisor:
+    """
+    Watches the treadmill and HR strap links for the length of a workout.
+
+    The treadmill counts as lost when its client reports a disconnect or no
+    data notification has arrived for stall_timeout seconds. It is then
+    reconnected in the background with exponential backoff (see
+    TreadmillControl.reconnect) until max_outage seconds have passed, after
+    which gave_up is set. Meanwhile the shared MotionEstimator coasts at the
+    last belt speed, so the ghosts and the video keep running on the same
+    clock, and on_reconnect is called once the link is back (RunRoutine uses
+    it to mark the gap in the TCX). A dropped HR strap is retried on its own
+    backoff without touching the treadmill.
+    """
+
+    def __init__(self, treadmill, motion=None, stall_timeout=5.0, check_interval=1.0,
+                 backoff_initial=1.0, backoff_max=30.0, max_outage=300.0, on_reconnect=None):
+        self.treadmill = treadmill
+        self.motion = motion
+        self.stall_timeout = stall_timeout
+        self.check_interval = check_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.max_outage = max_outage
+        self.on_reconnect = on_reconnect
+
+        self.last_sample = None
+        self.gave_up = asyncio.Event()
+        self.hr_backoff = backoff_initial
+        self.hr_next_attempt = 0.0
+
+        # Metrics
+        self.outages = 0
+        self.outage_seconds = 0.0
+        self.hr_outages = 0
+
+    def sample_received(self, now=None):
+        self.last_sample = time.monotonic() if now is None else now
+
+    def treadmill_lost(self, now):
+        client = self.treadmill.client
+        if client is not None and not client.is_connected:
+            return True
+        return now - self.last_sample > self.stall_timeout
+
+    async def run(self):
+        if self.treadmill.testing:
+            return
+        if self.last_sample is None:
+            self.sample_received()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            now = time.monotonic()
+            if self.treadmill_lost(now) and not await self.recover(now):
+                self.gave_up.set()
+                return
+            self.check_hr(now)
+
+    async def recover(self, started):
+        self.outages += 1
+        print(f"[LINK] Treadmill link lost (no data for {started - self.last_sample:.1f}s); reconnecting...")
+        if self.motion is not None:
+            self.motion.coast(started)
+
+        delay = self.backoff_initial
+        while True:
+            try:
+                await self.treadmill.reconnect()
+                break
+            except Exception as e:
+                if time.monotonic() + delay - started > self.max_outage:
+                    print(f"[LINK] Giving up on the treadmill after {time.monotonic() - started:.0f}s: {e}")
+                    return False
+                print(f"[LINK] Reconnect failed ({e}); retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.backoff_max)
+
+        outage = time.monotonic() - started
+        self.outage_seconds += outage
+        print(f"[LINK] Treadmill link restored after {outage:.1f}s")
+        self.sample_received()  # The restored subscription gets a full stall_timeout to deliver
+        if self.on_reconnect is not None:
+            self.on_reconnect()
+        return True
+
+    def check_hr(self, now):
+        hr_client = self.treadmill.hr_client
+        if hr_client is None or hr_client.is_connected or now < self.hr_next_attempt:
+            return
+        # Shares TreadmillControl.hr_task so this never overlaps the connect() attempt's scan
+        hr_task = self.treadmill.hr_task
+        if hr_task is not None and not hr_task.done():
+            return
+        if self.treadmill.latest_hr is not None:
+            self.hr_outages += 1
+            self.hr_backoff = self.backoff_initial
+            print("[LINK] Heart rate monitor lost; reconnecting...")
+        self.treadmill.latest_hr = None  # Don't keep logging the last value through the outage
+        self.hr_next_attempt = now + self.hr_backoff
+        self.hr_backoff = min(self.hr_backoff * 2, self.backoff_max)
+        self.treadmill.hr_task = asyncio.create_task(self.treadmill.try_connect_hr_monitor())
+
+    def stats(self):
+        return {
+            "outages": self.outages,
+            "outage_s": round(self.outage_seconds, 1),
+            "hr_outages": self.hr_outages,
+        }
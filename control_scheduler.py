@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from treadmill_control import ControlOpCode, ResultCode
+
+# Sent ahead of anything else waiting in the mailbox
+PRIORITY_OP_CODES = (ControlOpCode.STOP_OR_PAUSE, ControlOpCode.START_OR_RESUME, ControlOpCode.REQUEST_CONTROL)
+# Dropped when a stop goes out ahead of them, so they can't restart the belt
+TARGET_OP_CODES = (ControlOpCode.SET_TARGET_SPEED, ControlOpCode.SET_TARGET_INCLINE)
+
+
+class ControlPointScheduler:
+    """
+    The one task that writes to the FTMS control point.
+
+    Commands go into a mailbox with one slot per opcode: a newer speed (or
+    incline) replaces one that hasn't been sent yet, so the treadmill only
+    ever gets the latest value and callers never queue up behind stale ones.
+    Every caller whose value was coalesced gets the result of the command
+    that replaced it. Stop/start/control requests jump the queue, a stop
+    takes any speed or incline issued before it along with it, and writes
+    are spaced at least min_spacing seconds apart.
+    """
+
+    def __init__(self, treadmill, min_spacing=0.2, latency_window=500):
+        self.treadmill = treadmill
+        self.min_spacing = min_spacing
+        self.mailbox = {}  # opcode -> [payload, issued_at, futures]
+        self.in_flight = None  # The entry being written, so stop() can still cancel its futures
+        self.wakeup = asyncio.Event()
+        self.last_sent = None
+        self.task = None
+
+        # Metrics
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        entries = list(self.mailbox.values())
+        if self.in_flight is not None:
+            entries.append(self.in_flight)
+        for _, _, futures in entries:
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+        self.mailbox.clear()
+        self.in_flight = None
+
+    def submit(self, op_code, payload=b""):
+        """Queues a command; returns a future for its ResultCode. Awaiting it is optional."""
+        future = asyncio.get_running_loop().create_future()
+        self.submitted += 1
+        entry = self.mailbox.get(op_code)
+        if entry is not None:
+            self.coalesced += 1
+            entry[0] = payload
+            entry[1] = time.monotonic()
+            entry[2].append(future)
+        else:
+            self.mailbox[op_code] = [payload, time.monotonic(), [future]]
+        self.wakeup.set()
+        return future
+
+    def _next_op_code(self):
+        for op_code in PRIORITY_OP_CODES:
+            if op_code in self.mailbox:
+                return op_code
+        return min(self.mailbox, key=lambda op: self.mailbox[op][1])
+
+    async def run(self):
+        while True:
+            if not self.mailbox:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+
+            if self.last_sent is not None:
+                delay = self.last_sent + self.min_spacing - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)  # Anything submitted meanwhile coalesces into the mailbox
+
+            op_code = self._next_op_code()
+            self.in_flight = self.mailbox.pop(op_code)
+            payload, issued_at, futures = self.in_flight
+            if op_code == ControlOpCode.STOP_OR_PAUSE:
+                # Their callers get the stop's result, like any other superseded command
+                for target in TARGET_OP_CODES:
+                    entry = self.mailbox.get(target)
+                    if entry is not None and entry[1] <= issued_at:
+                        del self.mailbox[target]
+                        self.dropped += 1
+                        futures.extend(entry[2])
+            try:
+                result = await self.treadmill.send_command(op_code, payload)
+            except Exception as e:
+                print(f"[CONTROL] {ControlOpCode(op_code).name} write failed: {e}")
+                result = ResultCode.OPERATION_FAILED
+            self.last_sent = time.monotonic()
+
+            self.sent += 1
+            if result != ResultCode.SUCCESS:
+                self.failed += 1
+            else:
+                self.latencies.append(self.last_sent - issued_at)
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+            self.in_flight = None
+
+    def stats(self):
+        stats = {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+        if self.latencies:
+            p50, p95 = np.percentile(self.latencies, [50, 95])
+            stats.update(latency_p50_ms=round(float(p50) * 1000, 1), latency_p95_ms=round(float(p95) * 1000, 1),
+                         latency_max_ms=round(max(self.latencies) * 1000, 1))
+        return stats
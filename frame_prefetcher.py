@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FramePrefetcher:
+    """
+    Decodes and resizes video frames on a worker thread so the asyncio loop
+    only has to pick up ready frames and present them.
+
+    Frames live in a fixed pool of screen-sized slots allocated up front: the
+    decoder reuses one raw buffer and resizes straight into a free slot, and
+    the consumer hands each slot back with release() once it is shown. At a
+    reduced render size, captures that can scale while decoding are asked for
+    smaller frames, which are upscaled into the slot here, so the loop always
+    gets a screen-sized frame and draws the HUD at full resolution.
+    """
+
+    def __init__(self, cap, size, buffer_size=8):
+        self.cap = cap
+        self.size = size
+        self.buffer_size = buffer_size
+        self.frames = deque()
+        self.condition = threading.Condition()
+        self.finished = False
+        self.stopped = False
+        self.release_cap = False  # close() timed out: the worker releases the capture on its way out
+        self.skip_to = 0
+
+        # Ready frames + the one on screen + the one being decoded
+        width, height = size
+        self.free_slots = deque(np.empty((height, width, 3), dtype=np.uint8) for _ in range(buffer_size + 2))
+        self.raw = None
+
+        # Quality knobs, see playback_quality.py
+        self.render_size = size
+        self.decode_size = size  # Last output size asked of the capture
+        self.interpolation = cv2.INTER_LINEAR
+        self.frame_step = 1
+        self.thread = threading.Thread(target=self._run, name="FramePrefetcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        index = 0
+        try:
+            while True:
+                with self.condition:
+                    while (len(self.frames) >= self.buffer_size or not self.free_slots) and not self.stopped:
+                        self.condition.wait()
+                    if self.stopped:
+                        break
+                    skip_to = self.skip_to
+                    slot = self.free_slots.popleft()
+                    render_width, render_height = self.render_size
+                    interpolation = self.interpolation
+                    frame_step = self.frame_step
+
+                # Frames we already know we won't show are grabbed but never retrieved/resized
+                grabbed = True
+                while index < skip_to and grabbed:
+                    grabbed = self.cap.grab()
+                    index += 1
+
+                if (render_width, render_height) != self.decode_size and hasattr(self.cap, "set_output_size"):
+                    # Takes effect from the next decoded frame; frames already decoded still fit below
+                    self.cap.set_output_size((render_width, render_height))
+                    self.decode_size = (render_width, render_height)
+
+                ret = False
+                decode_start = time.perf_counter()
+                if grabbed:
+                    ret, self.raw = self.cap.read(self.raw)
+                if not ret:
+                    self.release(slot)
+                    break
+                resize_start = time.perf_counter()
+                if self.raw.shape == slot.shape:
+                    np.copyto(slot, self.raw)  # Decoder already scaled it
+                elif self.raw.shape[:2] == (render_height, render_width):
+                    # Decoded at the reduced size: a nearest-neighbour upscale is all that's left
+                    cv2.resize(self.raw, self.size, dst=slot, interpolation=cv2.INTER_NEAREST)
+                else:
+                    cv2.resize(self.raw, self.size, dst=slot, interpolation=interpolation)
+                frame = slot
+                resize_end = time.perf_counter()
+
+                with self.condition:
+                    self.frames.append((index, frame, resize_start - decode_start, resize_end - resize_start))
+                    self.condition.notify_all()
+                index += 1
+
+                # Grab-only skipping under heavy load: decode the in-between frames, never retrieve them
+                for _ in range(frame_step - 1):
+                    if not self.cap.grab():
+                        break
+                    index += 1
+        except Exception as e:
+            # A decode error must still end playback, or the consumer waits for frames forever
+            print(f"[PREFETCH] Decoding stopped at frame {index}: {e}")
+        finally:
+            with self.condition:
+                self.finished = True
+                release_cap = self.release_cap
+                self.condition.notify_all()
+            if release_cap:
+                self.cap.release()
+
+    def get_nowait(self):
+        # Returns (frame_index, frame, decode_s, resize_s) or None if nothing is ready yet;
+        # release() the frame when done
+        with self.condition:
+            if not self.frames:
+                return None
+            return self.frames.popleft()
+
+    def release(self, frame):
+        # Hand the pooled slot back to the decoder
+        with self.condition:
+            self.free_slots.append(frame)
+            self.condition.notify_all()
+
+    def set_quality(self, interpolation, render_scale, frame_step):
+        width, height = self.size
+        with self.condition:
+            self.interpolation = interpolation
+            self.render_size = (max(1, int(width * render_scale)), max(1, int(height * render_scale)))
+            self.frame_step = max(1, frame_step)
+
+    def seek(self, frame_index):
+        # Skip ahead: drop buffered frames before frame_index and let the decoder grab() past the rest
+        with self.condition:
+            if frame_index <= self.skip_to:
+                return
+            self.skip_to = frame_index
+            while self.frames and self.frames[0][0] < frame_index:
+                self.free_slots.append(self.frames.popleft()[1])
+            self.condition.notify_all()
+
+    @property
+    def exhausted(self):
+        with self.condition:
+            return self.finished and not self.frames
+
+    def stop(self):
+        # Only signals the worker; close() waits for it
+        with self.condition:
+            self.stopped = True
+            while self.frames:
+                self.free_slots.append(self.frames.popleft()[1])
+            self.condition.notify_all()
+
+    def close(self, timeout=2.0):
+        """
+        Stops the worker and releases the capture once nothing is using it.
+
+        Blocks for up to timeout (and on the capture's own release, which may
+        join a preload thread), so call it from an executor. If the worker is
+        still stuck in a read, the capture is left for it to release when the
+        read returns rather than pulled out from under it.
+        """
+        self.stop()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+        with self.condition:
+            if self.thread.is_alive() and not self.finished:
+                self.release_cap = True
+                print("[PREFETCH] Decoder still busy; it will release the capture when its read returns")
+                return
+        self.cap.release()
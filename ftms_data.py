@@ -0,0 +1,196 @@
+"""
+FTMS Treadmill Data (0x2ACD) parsing shared by the workout and the logging tools.
+
+A notification is a 16-bit flags word followed by whichever fields the flags
+announce. The layout for a flags value (a struct.Struct plus where each field
+sits in the unpacked tuple) is built once and cached, so a notification is
+decoded with a single unpack_from into a TreadmillData record carrying every
+field (None when absent).
+TreadmillData.encode() builds the notification back, which the self-test
+uses to round-trip the packets in treadmill_log.json.
+
+    python ftms_data.py --selftest [--log treadmill_log.json]
+    python ftms_data.py --benchmark [--seconds 2]
+"""
+import argparse
+import json
+import os
+import struct
+import time
+
+LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "treadmill_log.json")
+
+# Per flag bit, in packet order: (field, struct code, divisor). Bit 0 is "more data":
+# instantaneous speed is present when it is clear. Total distance is a uint24, read as "HB".
+FIELDS = (
+    (0, (("speed_kmh", "H", 100),)),
+    (1, (("average_speed_kmh", "H", 100),)),
+    (2, (("distance_km", "HB", 1000),)),
+    (3, (("incline_percent", "h", 10), ("ramp_angle_deg", "h", 10))),
+    (4, (("positive_elevation_gain_m", "H", 10), ("negative_elevation_gain_m", "H", 10))),
+    (5, (("instantaneous_pace_sec_per_km", "H", 1),)),
+    (6, (("average_pace_sec_per_km", "H", 1),)),
+    (7, (("total_energy_kcal", "H", 1), ("energy_per_hour_kcal", "H", 1), ("energy_per_minute_kcal", "B", 1))),
+    (8, (("heart_rate_bpm", "B", 1),)),
+    (9, (("metabolic_equivalent", "B", 10),)),
+    (10, (("elapsed_time_s", "H", 1),)),
+    (11, (("remaining_time_s", "H", 1),)),
+    (12, (("force_on_belt_n", "h", 1), ("power_output_w", "h", 1))),
+)
+FIELD_NAMES = tuple(name for _, fields in FIELDS for name, _, _ in fields)
+
+_layouts = {}
+
+
+def _field_present(flags, bit):
+    return not flags & 1 if bit == 0 else bool(flags & (1 << bit))
+
+
+class TreadmillData:
+    __slots__ = ("flags",) + FIELD_NAMES
+
+    def __init__(self, flags=0, speed_kmh=None, average_speed_kmh=None, distance_km=None, incline_percent=None,
+                 ramp_angle_deg=None, positive_elevation_gain_m=None, negative_elevation_gain_m=None,
+                 instantaneous_pace_sec_per_km=None, average_pace_sec_per_km=None, total_energy_kcal=None,
+                 energy_per_hour_kcal=None, energy_per_minute_kcal=None, heart_rate_bpm=None,
+                 metabolic_equivalent=None, elapsed_time_s=None, remaining_time_s=None, force_on_belt_n=None,
+                 power_output_w=None):
+        self.flags = flags
+        self.speed_kmh = speed_kmh
+        self.average_speed_kmh = average_speed_kmh
+        self.distance_km = distance_km
+        self.incline_percent = incline_percent
+        self.ramp_angle_deg = ramp_angle_deg
+        self.positive_elevation_gain_m = positive_elevation_gain_m
+        self.negative_elevation_gain_m = negative_elevation_gain_m
+        self.instantaneous_pace_sec_per_km = instantaneous_pace_sec_per_km
+        self.average_pace_sec_per_km = average_pace_sec_per_km
+        self.total_energy_kcal = total_energy_kcal
+        self.energy_per_hour_kcal = energy_per_hour_kcal
+        self.energy_per_minute_kcal = energy_per_minute_kcal
+        self.heart_rate_bpm = heart_rate_bpm
+        self.metabolic_equivalent = metabolic_equivalent
+        self.elapsed_time_s = elapsed_time_s
+        self.remaining_time_s = remaining_time_s
+        self.force_on_belt_n = force_on_belt_n
+        self.power_output_w = power_output_w
+
+    def __repr__(self):
+        present = ", ".join(f"{name}={getattr(self, name)}" for name in FIELD_NAMES if getattr(self, name) is not None)
+        return f"TreadmillData(flags=0x{self.flags:04x}, {present})"
+
+    def __eq__(self, other):
+        return isinstance(other, TreadmillData) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in FIELD_NAMES if getattr(self, name) is not None}
+
+    def encode(self):
+        """The notification payload for this record; flags are derived from which fields are set."""
+        flags = self.flags & ~0x1FFF
+        values = []
+        for bit, fields in FIELDS:
+            if all(getattr(self, name) is None for name, _, _ in fields):
+                if bit == 0:
+                    flags |= 1
+                continue
+            if bit:
+                flags |= 1 << bit
+            for name, code, divisor in fields:
+                raw = round((getattr(self, name) or 0) * divisor)
+                values.extend((raw & 0xFFFF, raw >> 16) if code == "HB" else (raw,))
+        return _layout(flags)[0].pack(flags, *values)
+
+
+def _layout(flags):
+    """(Struct, ((field, value index, divisor, is_uint24), ...)) for a flags value, built once."""
+    layout = _layouts.get(flags)
+    if layout is None:
+        codes = ["<H"]
+        fields = []
+        i = 1
+        for bit, bit_fields in FIELDS:
+            if not _field_present(flags, bit):
+                continue
+            for name, code, divisor in bit_fields:
+                codes.append(code)
+                fields.append((name, i, divisor, code == "HB"))
+                i += len(code)
+        layout = _layouts[flags] = (struct.Struct("".join(codes)), tuple(fields))
+    return layout
+
+
+def parse_treadmill_data(data):
+    """Decodes one Treadmill Data notification into a TreadmillData record."""
+    layout, fields = _layout(data[0] | data[1] << 8)
+    values = layout.unpack_from(data)
+    record = TreadmillData(values[0])
+    for name, i, divisor, is_uint24 in fields:
+        value = values[i] | values[i + 1] << 16 if is_uint24 else values[i]
+        setattr(record, name, value / divisor if divisor != 1 else value)
+    return record
+
+
+def load_log_packets(log_path=LOG_PATH):
+    with open(log_path, "r") as f:
+        return [bytes.fromhex(entry["raw"]) for entry in json.load(f)]
+
+
+def synthetic_packets():
+    # Every flag bit set on its own, then all of them together
+    sample = TreadmillData(
+        speed_kmh=10.5, average_speed_kmh=9.75, distance_km=12.345, incline_percent=-1.5, ramp_angle_deg=0.5,
+        positive_elevation_gain_m=12.3, negative_elevation_gain_m=4.5, instantaneous_pace_sec_per_km=343,
+        average_pace_sec_per_km=369, total_energy_kcal=512, energy_per_hour_kcal=780, energy_per_minute_kcal=13,
+        heart_rate_bpm=152, metabolic_equivalent=9.8, elapsed_time_s=4321, remaining_time_s=600,
+        force_on_belt_n=-20, power_output_w=250,
+    )
+    packets = []
+    for _, fields in FIELDS:
+        record = TreadmillData(**{name: getattr(sample, name) for name, _, _ in fields})
+        packets.append(record.encode())
+    packets.append(sample.encode())
+    return packets
+
+
+def selftest(log_path=LOG_PATH):
+    packets = load_log_packets(log_path) + synthetic_packets()
+    failures = 0
+    for packet in packets:
+        record = parse_treadmill_data(packet)
+        encoded = record.encode()
+        if encoded != packet or parse_treadmill_data(encoded) != record:
+            failures += 1
+            print(f"Round trip failed: {packet.hex()} -> {record} -> {encoded.hex()}")
+    print(f"{len(packets) - failures}/{len(packets)} packets round-tripped ({len(_layouts)} layouts)")
+    return failures == 0
+
+
+def benchmark(log_path=LOG_PATH, seconds=2.0):
+    packets = load_log_packets(log_path) + synthetic_packets()
+    parsed = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for packet in packets:
+            parse_treadmill_data(packet)
+        parsed += len(packets)
+    elapsed = time.perf_counter() - start
+    print(f"{parsed} packets in {elapsed:.2f}s: {elapsed / parsed * 1e6:.2f} us per packet")
+    return elapsed / parsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--selftest", action="store_true", help="round-trip every logged packet plus one per flag bit")
+    parser.add_argument("--benchmark", action="store_true", help="report parse time per packet")
+    parser.add_argument("--log", default=LOG_PATH)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.selftest:
+        raise SystemExit(0 if selftest(args.log) else 1)
+    if args.benchmark:
+        benchmark(args.log, args.seconds)
+    else:
+        parser.print_help()
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import random
+
+import numpy as np
+
+from ghost_profile import GhostProfile
+from race_field import RaceField
+from sidecar_cache import atomic_write
+from virtual_competitors import generate_competitors_with_profiles
+
+CACHE_DIR = "ghost_cache"
+CACHE_VERSION = 1
+
+
+def new_seed():
+    return random.SystemRandom().randrange(2 ** 32)
+
+
+def cache_path(kind, extension, cache_dir=CACHE_DIR, **key):
+    # Floats are rounded so the same routine/speed always lands on the same file
+    key = {k: round(v, 4) if isinstance(v, float) else v for k, v in key.items()}
+    digest = hashlib.sha1(json.dumps({"version": CACHE_VERSION, **key}, sort_keys=True).encode()).hexdigest()
+    return os.path.join(cache_dir, f"{kind}_{digest[:16]}.{extension}")
+
+
+def cached_competitors(routine, duration_min, avg_speed, seed, count=3, cache_dir=CACHE_DIR, store=True):
+    """
+    generate_competitors_with_profiles(), cached on disk per (routine, duration, speed, seed, count).
+    store=False generates without touching the cache, for one-off seeds nothing will ask for again.
+    """
+    if not store:
+        return generate_competitors_with_profiles(duration_min, avg_speed, count, seed=seed)
+    path = cache_path("competitors", "json", cache_dir, routine=routine, duration_min=duration_min,
+                      avg_speed=avg_speed, seed=seed, count=count)
+    try:
+        with open(path, "r") as f:
+            competitors = json.load(f)
+    except (OSError, ValueError):
+        competitors = generate_competitors_with_profiles(duration_min, avg_speed, count, seed=seed)
+        stored = [{k: v for k, v in c.items() if k != "profile"} for c in competitors]
+        atomic_write(path, lambda f: f.write(json.dumps(stored).encode()))
+        return competitors
+
+    for competitor in competitors:
+        competitor["speed_profile"] = [tuple(point) for point in competitor["speed_profile"]]
+        competitor["profile"] = GhostProfile(competitor["speed_profile"])
+    return competitors
+
+
+def cached_race_field(routine, distance_km, seed, field_config, cache_dir=CACHE_DIR, store=True):
+    """RaceField.generate() for the "race_field" config, cached on disk as the two per-runner arrays unless store=False."""
+    params = {
+        "runners": field_config.get("runners", 400),
+        "median_pace_min_per_km": field_config.get("median_pace_min_per_km", 6.0),
+        "sigma": field_config.get("sigma", 0.18),
+    }
+    neighbours = field_config.get("neighbours", 2)
+    if not store:
+        return RaceField.generate(distance_km, neighbours=neighbours, seed=seed, **params)
+    path = cache_path("field", "npz", cache_dir, routine=routine, distance_km=float(distance_km), seed=seed, **params)
+    try:
+        with np.load(path) as arrays:
+            return RaceField(distance_km, arrays["finish_s"], arrays["split"], neighbours)
+    except (OSError, ValueError, KeyError):
+        field = RaceField.generate(distance_km, neighbours=neighbours, seed=seed, **params)
+        atomic_write(path, lambda f: np.savez(f, finish_s=field.finish_s, split=field.split))
+        return field
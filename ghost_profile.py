@@ -0,0 +1,49 @@
+from bisect import bisect_right
+
+
+class GhostProfile:
+    """
+    A ghost's speed over time as (seconds, km/h) breakpoints.
+
+    Speed is linear between breakpoints and holds its last value after the
+    final one; distance is the exact integral of that same speed curve, so
+    the speed and gap shown for a ghost always agree. Cumulative distance is
+    precomputed at every breakpoint, so a query is one bisect plus a
+    closed-form trapezoid, independent of how long the profile is.
+    """
+
+    def __init__(self, speed_profile):
+        points = sorted(speed_profile)
+        if not points:
+            points = [(0.0, 0.0)]
+        self.times = [float(t) for t, _ in points]
+        self.speeds_mps = [float(s) / 3.6 for _, s in points]
+
+        self.cum_distance_m = [0.0]
+        for i in range(1, len(points)):
+            dt = self.times[i] - self.times[i - 1]
+            self.cum_distance_m.append(self.cum_distance_m[-1] + dt * (self.speeds_mps[i - 1] + self.speeds_mps[i]) / 2)
+
+    def _segment(self, elapsed_seconds):
+        # Index of the breakpoint at or before elapsed_seconds, and the slope (m/s^2) after it
+        i = bisect_right(self.times, elapsed_seconds) - 1
+        if i + 1 < len(self.times):
+            slope = (self.speeds_mps[i + 1] - self.speeds_mps[i]) / (self.times[i + 1] - self.times[i])
+        else:
+            slope = 0.0
+        return i, slope
+
+    def speed_at(self, elapsed_seconds):
+        """Speed in km/h."""
+        if elapsed_seconds <= self.times[0]:
+            return self.speeds_mps[0] * 3.6
+        i, slope = self._segment(elapsed_seconds)
+        return (self.speeds_mps[i] + slope * (elapsed_seconds - self.times[i])) * 3.6
+
+    def distance_at(self, elapsed_seconds):
+        """Distance in metres covered since the first breakpoint."""
+        if elapsed_seconds <= self.times[0]:
+            return 0.0
+        i, slope = self._segment(elapsed_seconds)
+        dt = elapsed_seconds - self.times[i]
+        return self.cum_distance_m[i] + self.speeds_mps[i] * dt + 0.5 * slope * dt * dt
@@ -1,14 +1,19 @@
 import cv2
 import numpy as np
 
+from hud_layers import HudTile, blend_tile
+
 class GhostRunnerHUD:
-    def __init__(self, sprite_path='Animations/Runners.png', target_width=50, animation_speed=5):
+    def __init__(self, sprite_path='Animations/Runners.png', target_width=50, animation_speed=5, width_step=5):
         self.sprite_path = sprite_path
         self.target_width = target_width
         self.animation_speed = animation_speed
+        self.width_step = width_step
         self.frames = []
+        self.sprite_cache = {}  # (animation frame, width bucket, tinted) -> premultiplied HudTile
         self.frame_idx = 0
         self.frame_counter = 0
+        self.animate = True  # Turned off by the playback quality controller under load
         self._load_and_process_sprites()
 
     def _convert_black_on_white_to_white_on_transparent(self, frame):
@@ -39,19 +44,18 @@ class GhostRunnerHUD:
             return cv2.merge([b, g, r, a])
         return tinted
 
-    def _overlay_sprite(self, background, sprite, x, y):
-        h, w = sprite.shape[:2]
-        if y < 0 or y + h > background.shape[0] or x < 0 or x + w > background.shape[1]:
-            return
-        if sprite.shape[2] == 4:
-            alpha_s = sprite[:, :, 3] / 255.0
-            alpha_s = alpha_s[..., None]
-            alpha_b = 1.0 - alpha_s
-            for c in range(3):
-                background[y:y+h, x:x+w, c] = (alpha_s[:, :, 0] * sprite[:, :, c] +
-                                               alpha_b[:, :, 0] * background[y:y+h, x:x+w, c])
-        else:
-            background[y:y+h, x:x+w] = sprite
+    def _sprite_tile(self, frame_idx, width, tinted):
+        # Widths are bucketed so the cache stays small: frames x buckets x tint
+        bucket = max(self.width_step, min(self.target_width, int(round(width / self.width_step)) * self.width_step))
+        key = (frame_idx, bucket, tinted)
+        tile = self.sprite_cache.get(key)
+        if tile is None:
+            sprite = self._resize_sprite(self.frames[frame_idx], target_width=bucket)
+            if tinted:
+                sprite = self._tint_sprite_red(sprite)
+            tile = HudTile(sprite)
+            self.sprite_cache[key] = tile
+        return tile
 
     def _load_and_process_sprites(self):
         img = cv2.imread(self.sprite_path, cv2.IMREAD_UNCHANGED)
@@ -90,8 +94,9 @@ class GhostRunnerHUD:
                 right_runners.append((name, gap))
 
         # Update animation frame
-        self.frame_counter += 1
-        if self.frame_counter % self.animation_speed == 0:
+        if self.animate:
+            self.frame_counter += 1
+        if self.animate and self.frame_counter % self.animation_speed == 0:
             self.frame_idx = (self.frame_idx + 1) % len(self.frames)
 
         base_sprite = self.frames[self.frame_idx]
@@ -100,7 +105,10 @@ class GhostRunnerHUD:
 
         def draw_group(runners, side):
             max_runners = 3
-            selected = sorted(runners, reverse=True)[:max_runners]
+            if len(runners) > max_runners:
+                # A race field sends more neighbours than fit; keep the closest
+                runners = sorted(runners, key=lambda runner: abs(float(runner[1])))[:max_runners]
+            selected = sorted(runners, reverse=True)
             
             if side == "right":
                 start_x = screen_w - (sprite_w * max_runners) - (5 * (max_runners - 1)) - 20
@@ -116,11 +124,9 @@ class GhostRunnerHUD:
                         continue
                     ratio = max(0.0, min(1.0, 1 + (gap / 400.0)))
                     width = max(5, int(self.target_width * ratio))
-                    sprite = self._resize_sprite(base_sprite, target_width=width)
-                    if gap > 0:
-                        sprite = self._tint_sprite_red(sprite)
-                    x = start_x + i * (sprite.shape[1] + 5)
-                    self._overlay_sprite(frame, sprite, x, base_y)
+                    tile = self._sprite_tile(self.frame_idx, width, gap > 0)
+                    x = start_x + i * (tile.width + 5)
+                    blend_tile(frame, tile, x, base_y)
 
 
                 except Exception as e:
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from motion_estimator import MotionEstimator
+
+
+class GhostSnapshot:
+    """
+    The latest ghost state, updated in place by GhostTicker.
+
+    gaps maps display name -> gap in metres (positive: the user is ahead)
+    and keeps the same dict object for the whole workout; version changes
+    on every publish, so readers can tell a new tick from the one they
+    already drew.
+    """
+
+    __slots__ = ("version", "elapsed", "user_distance_m", "gaps", "race_position")
+
+    def __init__(self):
+        self.version = 0
+        self.elapsed = 0.0
+        self.user_distance_m = 0.0
+        self.gaps = {}
+        self.race_position = None  # (position, field_size) when racing a field
+
+
+class GhostTicker:
+    """
+    Evaluates every ghost at a fixed rate, independent of BLE notifications.
+
+    The user's distance comes from the shared MotionEstimator, so gaps move
+    smoothly instead of jumping once per notification. Display names are
+    only re-formatted when a ghost's displayed speed changes.
+    """
+
+    def __init__(self, ghosts, race_field=None, rate_hz=10.0, motion=None, snapshot=None):
+        self.ghosts = ghosts
+        self.race_field = race_field
+        self.interval = 1.0 / rate_hz
+        self.motion = motion if motion is not None else MotionEstimator()
+        self.snapshot = snapshot if snapshot is not None else GhostSnapshot()
+        self.names = [None] * len(ghosts)
+        self.shown_speeds = [None] * len(ghosts)
+        self.field_names = []
+        self.start_time = None
+
+    def start(self, now=None):
+        self.start_time = time.monotonic() if now is None else now
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        elapsed = now - self.start_time
+        user_distance_m = self.motion.distance_at(now)
+        gaps = self.snapshot.gaps
+
+        for i, ghost in enumerate(self.ghosts):
+            profile = ghost["profile"]
+            shown_speed = round(profile.speed_at(elapsed), 1)
+            if shown_speed != self.shown_speeds[i]:
+                gaps.pop(self.names[i], None)
+                self.shown_speeds[i] = shown_speed
+                self.names[i] = f"{ghost['base_name']} ({shown_speed:.1f} km/h)"
+            gaps[self.names[i]] = user_distance_m - profile.distance_at(elapsed)
+
+        if self.race_field is not None:
+            position, field_size, ahead, behind = self.race_field.standing(elapsed, user_distance_m)
+            for name in self.field_names:
+                gaps.pop(name, None)
+            self.field_names = []
+            for place, (runner, gap) in enumerate(ahead, start=1):
+                self._add_field_runner(position - place, runner, gap, elapsed)
+            for place, (runner, gap) in enumerate(behind, start=1):
+                self._add_field_runner(position + place, runner, gap, elapsed)
+            self.snapshot.race_position = (position, field_size)
+
+        self.snapshot.elapsed = elapsed
+        self.snapshot.user_distance_m = user_distance_m
+        self.snapshot.version += 1
+        return self.snapshot
+
+    def _add_field_runner(self, place, runner, gap, elapsed):
+        name = f"#{place} ({self.race_field.speed_kmh(runner, elapsed):.1f} km/h)"
+        self.field_names.append(name)
+        self.snapshot.gaps[name] = gap
+
+    async def run(self):
+        if self.start_time is None:
+            self.start()
+        next_tick = time.monotonic()
+        while True:
+            self.tick()
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()  # Fell behind; don't try to catch up with a burst
+                delay = 0
+            await asyncio.sleep(delay)
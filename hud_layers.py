@@ -0,0 +1,106 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class HudTile:
+    """A pre-rendered BGRA layer stored premultiplied, ready to blend."""
+
+    def __init__(self, bgra, origin_x=0, origin_y=0, text_width=0, text_height=0):
+        alpha = bgra[:, :, 3:4].astype(np.uint16)
+        self.premultiplied = ((bgra[:, :, :3] * alpha + 127) // 255).astype(np.uint8)
+        self.inv_alpha = np.repeat(255 - alpha, 3, axis=2).astype(np.uint8)
+        self.height, self.width = bgra.shape[:2]
+        # Offset from the tile's top-left to the cv2.putText origin (text baseline)
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.text_width = text_width
+        self.text_height = text_height
+
+
+def render_text_tile(text, scale, color, thickness):
+    (text_width, text_height), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+    pad = thickness
+    tile_h = text_height + baseline + 2 * pad
+    tile_w = text_width + 2 * pad
+    alpha = np.zeros((tile_h, tile_w), dtype=np.uint8)
+    cv2.putText(alpha, text, (pad, pad + text_height), FONT, scale, 255, thickness)
+
+    bgra = np.zeros((tile_h, tile_w, 4), dtype=np.uint8)
+    bgra[:, :, :3] = color
+    bgra[:, :, 3] = alpha
+    return HudTile(bgra, origin_x=pad, origin_y=pad + text_height, text_width=text_width, text_height=text_height)
+
+
+def blend_tile(frame, tile, x, y):
+    # Integer "over" blend: dst = src_premultiplied + dst * (255 - alpha) / 255, clipped to the frame
+    frame_h, frame_w = frame.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + tile.width, frame_w), min(y + tile.height, frame_h)
+    if x0 >= x1 or y0 >= y1:
+        return
+    tx0, ty0 = x0 - x, y0 - y
+    tx1, ty1 = tx0 + (x1 - x0), ty0 + (y1 - y0)
+
+    roi = frame[y0:y1, x0:x1]
+    cv2.multiply(roi, tile.inv_alpha[ty0:ty1, tx0:tx1], dst=roi, scale=1 / 255.0)
+    cv2.add(roi, tile.premultiplied[ty0:ty1, tx0:tx1], dst=roi)
+
+
+class ExitDialog:
+    """The translucent exit confirmation box, rendered once and blended into its region."""
+
+    def __init__(self, x=200, y=200, width=400, height=200, alpha=0.7):
+        self.x, self.y = x, y
+        self.alpha = alpha
+        self.panel = np.zeros((height, width, 3), dtype=np.uint8)
+        cv2.putText(self.panel, "Exit workout?", (50, 70), FONT, 1.0, (255, 255, 255), 2)
+        cv2.putText(self.panel, "Y = Yes, ESC = No", (50, 120), FONT, 0.8, (255, 255, 255), 2)
+
+    def draw(self, frame):
+        frame_h, frame_w = frame.shape[:2]
+        height = min(self.panel.shape[0], frame_h - self.y)
+        width = min(self.panel.shape[1], frame_w - self.x)
+        if height <= 0 or width <= 0:
+            return
+        roi = frame[self.y:self.y + height, self.x:self.x + width]
+        cv2.addWeighted(self.panel[:height, :width], self.alpha, roi, 1 - self.alpha, 0, dst=roi)
+
+
+class HudCompositor:
+    """
+    Draws HUD text from cached tiles keyed by the displayed string.
+
+    Values like speed or distance change at most once a second while frames
+    arrive at 15-30 fps, so each string is rasterised once and then only
+    blended. The cache is a bounded LRU.
+    """
+
+    def __init__(self, max_tiles=256):
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+
+    def tile(self, text, scale, color, thickness):
+        key = (text, scale, color, thickness)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = render_text_tile(text, scale, color, thickness)
+            self.tiles[key] = tile
+            if len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def draw_text(self, frame, text, org, scale, color, thickness, align="left"):
+        tile = self.tile(text, scale, color, thickness)
+        x, y = org
+        if align == "right":
+            x -= tile.text_width
+        elif align == "center":
+            x -= tile.text_width // 2
+        blend_tile(frame, tile, x - tile.origin_x, y - tile.origin_y)
+        return tile
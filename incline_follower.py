@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+
+class InclineFollower:
+    """
+    Follows the per-frame incline column of a video's route data.
+
+    The target is the mean incline over a window placed lookahead_m ahead of
+    the runner (the treadmill takes a few seconds to tilt), quantised to the
+    treadmill's 0.1% resolution. A command is only sent when the target moves
+    by at least min_change and the commands-per-minute budget allows it, so
+    the FTMS control point is never flooded.
+    """
+
+    def __init__(self, route, treadmill, get_distance_km, lookahead_m=20.0, window_m=40.0,
+                 min_change=0.5, max_commands_per_minute=4, min_incline=0.0, max_incline=10.0,
+                 resolution=0.1, interval=1.0):
+        self.route = route
+        self.treadmill = treadmill
+        self.get_distance_km = get_distance_km
+        self.lookahead_m = lookahead_m
+        self.window_m = window_m
+        self.min_change = min_change
+        self.max_commands_per_minute = max_commands_per_minute
+        self.min_incline = min_incline
+        self.max_incline = max_incline
+        self.resolution = resolution
+        self.interval = interval
+
+        # Prefix sums make any window mean O(1)
+        self.incline_cumsum = np.concatenate(([0.0], np.cumsum(route.incline, dtype=np.float64)))
+        self.sent_times = deque()
+        self.last_sent = None
+        self.commands_sent = 0
+        self.commands_skipped = 0
+        self.last_deferred = None
+
+    @classmethod
+    def from_config(cls, route, treadmill, get_distance_km, config):
+        return cls(
+            route,
+            treadmill,
+            get_distance_km,
+            lookahead_m=config.get("lookahead_m", 20.0),
+            window_m=config.get("window_m", 40.0),
+            min_change=config.get("min_change_percent", 0.5),
+            max_commands_per_minute=config.get("max_commands_per_minute", 4),
+            min_incline=config.get("min_incline_percent", 0.0),
+            max_incline=config.get("max_incline_percent", 10.0),
+        )
+
+    def mean_incline(self, start_m, end_m):
+        r0 = self.route.row_for_distance(start_m)
+        r1 = self.route.row_for_distance(end_m)
+        if r1 <= r0:
+            return float(self.route.incline[r0])
+        return float((self.incline_cumsum[r1 + 1] - self.incline_cumsum[r0]) / (r1 + 1 - r0))
+
+    def target_for_distance(self, distance_m):
+        centre = distance_m + self.lookahead_m
+        incline = self.mean_incline(centre - self.window_m / 2, centre + self.window_m / 2)
+        incline = min(max(incline, self.min_incline), self.max_incline)
+        return round(round(incline / self.resolution) * self.resolution, 1)
+
+    def budget_available(self, now):
+        while self.sent_times and now - self.sent_times[0] >= 60.0:
+            self.sent_times.popleft()
+        return len(self.sent_times) < self.max_commands_per_minute
+
+    def should_send(self, target, now):
+        if self.last_sent is not None and abs(target - self.last_sent) < self.min_change:
+            return False
+        if not self.budget_available(now):
+            # Counted once per held-back target, not once per poll while the budget is spent
+            if target != self.last_deferred:
+                self.commands_skipped += 1
+                self.last_deferred = target
+            return False
+        self.last_deferred = None
+        return True
+
+    async def run(self):
+        print(f"[INCLINE] Following video incline ({self.lookahead_m:.0f} m lookahead, "
+              f"max {self.max_commands_per_minute} commands/min)")
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                target = self.target_for_distance(self.get_distance_km() * 1000)
+                now = time.monotonic()
+                if self.should_send(target, now):
+                    self.sent_times.append(now)
+                    self.last_sent = target
+                    self.commands_sent += 1
+                    await self.treadmill.set_incline(target)
+        finally:
+            print(f"[INCLINE] Sent {self.commands_sent} incline commands, {self.commands_skipped} deferred by budget")
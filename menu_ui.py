@@ -49,7 +49,7 @@ def draw_vertical_gradient(surface, color_start, color_end):
         b = int(color_start[2] * (1 - ratio) + color_end[2] * ratio)
         pygame.draw.line(surface, (r, g, b), (0, y), (surface.get_width(), y))
 
-def run_selection_ui(screen, routines, videos, start_speed=8.5, pb_times=None):
+def run_selection_ui(screen, routines, videos, start_speed=8.5, pb_times=None, warmup=None, last_runs=None):
     import pygame
     from pathlib import Path
     import os
@@ -91,6 +91,7 @@ def run_selection_ui(screen, routines, videos, start_speed=8.5, pb_times=None):
 
     fonts = load_fonts()
     pb_times = pb_times or {}
+    last_runs = last_runs or {}  # routine name -> TCX of its last session, raced with 'R'
 
     routine_names = list(routines.keys())
     routine_thumbs = [load_thumbnail(f"routines/{name}.png") for name in routine_names]
@@ -115,6 +116,10 @@ def run_selection_ui(screen, routines, videos, start_speed=8.5, pb_times=None):
     background_img = pygame.transform.scale(background_img, screen.get_size())
 
     while running:
+        # Let the background loader open whichever video is selected (see video_playlist.VideoWarmup)
+        if warmup is not None and video_files:
+            warmup.focus(os.path.join('videos', video_files[selections[1]]))
+
         screen.blit(background_img, (0, 0))
         screen_width = screen.get_width()
 
@@ -216,16 +221,20 @@ def run_selection_ui(screen, routines, videos, start_speed=8.5, pb_times=None):
             start_text = fonts['start'].render("START", True, WHITE)
 
         screen.blit(start_text, start_text.get_rect(center=start_rect.center))
+
+        if routine_names[selections[0]] in last_runs:
+            hint = fonts['title'].render("R = race your last run on this routine", True, WHITE)
+            screen.blit(hint, hint.get_rect(center=(screen_width // 2, START_BUTTON_Y + 80)))
         pygame.display.flip()
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
-                return None, None, None
+                return None, None, None, None
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     pygame.quit()
-                    return None, None, None
+                    return None, None, None, None
                 elif event.key == pygame.K_DOWN:
                     focused = (focused + 1) % 4
                 elif event.key == pygame.K_UP:
@@ -250,6 +259,11 @@ def run_selection_ui(screen, routines, videos, start_speed=8.5, pb_times=None):
                     routine = routine_names[selections[0]]
                     video_file = video_files[selections[1]]
                     speed = speeds[selections[2]]
-                    return routine, os.path.join('videos', video_file), speed
+                    return routine, os.path.join('videos', video_file), speed, None
+                elif event.key == pygame.K_r and routine_names[selections[0]] in last_runs:
+                    routine = routine_names[selections[0]]
+                    video_file = video_files[selections[1]]
+                    speed = speeds[selections[2]]
+                    return routine, os.path.join('videos', video_file), speed, last_runs[routine]
 
         clock.tick(30)
@@ -0,0 +1,84 @@
+import time
+
+
+class MotionEstimator:
+    """
+    Dead-reckons the runner's distance between ~1 Hz FTMS samples.
+
+    distance_at(t) extrapolates from the last sample at the current belt
+    speed (for at most max_extrapolation seconds). When the next sample
+    lands, the difference between estimate and sample is not applied as a
+    jump but bled off linearly over correction_time, and the estimate never
+    runs backwards. Differences above snap_m (a reset or reconnect) are
+    taken as-is. While coasting (a link outage) the extrapolation is not
+    capped, so the runner keeps moving at the last belt speed until samples
+    return.
+    """
+
+    def __init__(self, max_extrapolation=2.0, correction_time=0.5, snap_m=25.0):
+        self.max_extrapolation = max_extrapolation
+        self.correction_time = correction_time
+        self.snap_m = snap_m
+
+        self.base_m = 0.0
+        self.base_time = None
+        self.speed_mps = 0.0
+        self.correction_m = 0.0
+        self.correction_start = 0.0
+        self.last_time = None
+        self.last_m = 0.0
+        self.samples = 0
+        self.coasting = False
+
+    def _raw(self, now):
+        if self.base_time is None:
+            return self.base_m
+        ahead = max(now - self.base_time, 0.0)
+        if not self.coasting:
+            ahead = min(ahead, self.max_extrapolation)
+        return self.base_m + self.speed_mps * ahead
+
+    def _correction(self, now):
+        if not self.correction_m:
+            return 0.0
+        remaining = 1.0 - (now - self.correction_start) / self.correction_time
+        return self.correction_m * min(max(remaining, 0.0), 1.0)
+
+    def update(self, distance_km, speed_kmh, now=None):
+        """Feed a treadmill sample (km, km/h)."""
+        now = time.monotonic() if now is None else now
+        sample_m = (distance_km or 0.0) * 1000
+        correction = self.distance_at(now) - sample_m if self.samples else 0.0
+        if abs(correction) > self.snap_m:
+            correction = 0.0
+            self.last_time = None  # Let the estimate jump, even backwards
+        self.base_m = sample_m
+        self.base_time = now
+        self.speed_mps = max(speed_kmh or 0.0, 0.0) / 3.6
+        self.correction_m = correction
+        self.correction_start = now
+        self.samples += 1
+        self.coasting = False
+
+    def set_speed(self, speed_kmh, now=None):
+        # A speed change without a new distance: rebase so the estimate stays continuous
+        now = time.monotonic() if now is None else now
+        self.base_m = self._raw(now)
+        self.base_time = now
+        self.speed_mps = max(speed_kmh or 0.0, 0.0) / 3.6
+
+    def coast(self, now=None):
+        # No samples for a while: rebase at the current estimate and keep extrapolating at the last speed
+        self.set_speed(self.speed_mps * 3.6, now)
+        self.coasting = True
+
+    def distance_at(self, now=None):
+        """Estimated distance in metres at monotonic time now."""
+        now = time.monotonic() if now is None else now
+        distance = self._raw(now) + self._correction(now)
+        if self.last_time is not None and now >= self.last_time:
+            distance = max(distance, self.last_m)
+        if self.last_time is None or now >= self.last_time:
+            self.last_time = now
+            self.last_m = distance
+        return distance
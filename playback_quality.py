@@ -0,0 +1,73 @@
+import time
+
+import cv2
+
+# Cheapest-last. Each step keeps everything the previous one gave up.
+QUALITY_LEVELS = (
+    {"name": "full", "interpolation": cv2.INTER_LINEAR, "render_scale": 1.0, "animate_sprites": True, "frame_step": 1},
+    {"name": "fast-resize", "interpolation": cv2.INTER_NEAREST, "render_scale": 1.0, "animate_sprites": True, "frame_step": 1},
+    {"name": "half-resolution", "interpolation": cv2.INTER_NEAREST, "render_scale": 0.5, "animate_sprites": True, "frame_step": 1},
+    {"name": "static-sprites", "interpolation": cv2.INTER_NEAREST, "render_scale": 0.5, "animate_sprites": False, "frame_step": 1},
+    {"name": "grab-skip", "interpolation": cv2.INTER_NEAREST, "render_scale": 0.5, "animate_sprites": False, "frame_step": 2},
+)
+
+
+class QualityController:
+    """
+    Steps playback quality down when frames don't fit their budget and back
+    up when headroom returns.
+
+    Load is the slower of the presentation loop's own work and the decoder's
+    decode+resize time, divided by the frame budget (frame interval / speed
+    ratio), smoothed with an EWMA. Late frames count as overload regardless.
+    A cooldown between steps stops it oscillating.
+    """
+
+    def __init__(self, degrade_load=0.9, restore_load=0.55, late_fraction=0.2, window=30, cooldown=3.0,
+                 smoothing=0.1, levels=QUALITY_LEVELS):
+        self.degrade_load = degrade_load
+        self.restore_load = restore_load
+        self.late_fraction = late_fraction
+        self.window = window
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.levels = levels
+        self.level = 0
+        self.load = 0.0
+        self.frames_in_window = 0
+        self.late_in_window = 0
+        self.last_change = None
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def observe(self, busy_time, decode_time, frame_budget, late, now=None):
+        """Feed one presented frame. Returns the new settings dict when the level changes, else None."""
+        now = time.monotonic() if now is None else now
+        sample = max(busy_time, decode_time) / max(frame_budget, 1e-3)
+        self.load += self.smoothing * (sample - self.load)
+        self.frames_in_window += 1
+        self.late_in_window += 1 if late else 0
+
+        if self.frames_in_window < self.window:
+            return None
+        late_fraction = self.late_in_window / self.frames_in_window
+        self.frames_in_window = 0
+        self.late_in_window = 0
+        if self.last_change is not None and now - self.last_change < self.cooldown:
+            return None
+
+        if (self.load > self.degrade_load or late_fraction > self.late_fraction) and self.level < len(self.levels) - 1:
+            return self._change(self.level + 1, now, late_fraction)
+        if self.load < self.restore_load and late_fraction == 0 and self.level > 0:
+            return self._change(self.level - 1, now, late_fraction)
+        return None
+
+    def _change(self, level, now, late_fraction):
+        previous = self.settings["name"]
+        self.level = level
+        self.last_change = now
+        print(f"[QUALITY] {previous} -> {self.settings['name']} "
+              f"(load {self.load:.2f}, {late_fraction:.0%} late)")
+        return self.settings
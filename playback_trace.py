@@ -0,0 +1,95 @@
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+STAGES = ("decode", "resize", "queues", "hud", "ghosts", "imshow", "wait")
+COLUMNS = ("frame_index", "timestamp") + STAGES + ("lateness", "speed_ratio")
+
+
+class PlaybackTrace:
+    """
+    Per-frame timing trace for play_video.
+
+    Rows go into a preallocated ring buffer (the oldest rows are overwritten
+    once capacity is reached), so tracing a long session costs a fixed amount
+    of memory. Stage times and lateness are in seconds.
+    """
+
+    def __init__(self, capacity=36000):
+        self.capacity = capacity
+        self.rows = np.zeros((capacity, len(COLUMNS)), dtype=np.float64)
+        self.count = 0
+        self.start = time.monotonic()
+
+    def record(self, frame_index, decode=0.0, resize=0.0, queues=0.0, hud=0.0, ghosts=0.0, imshow=0.0, wait=0.0,
+               lateness=0.0, speed_ratio=1.0):
+        row = self.rows[self.count % self.capacity]
+        row[0] = frame_index
+        row[1] = time.monotonic() - self.start
+        row[2] = decode
+        row[3] = resize
+        row[4] = queues
+        row[5] = hud
+        row[6] = ghosts
+        row[7] = imshow
+        row[8] = wait
+        row[9] = lateness
+        row[10] = speed_ratio
+        self.count += 1
+
+    def valid_rows(self):
+        if self.count <= self.capacity:
+            return self.rows[:self.count]
+        # Unroll the ring so rows come out oldest first
+        split = self.count % self.capacity
+        return np.concatenate((self.rows[split:], self.rows[:split]))
+
+    def summary(self):
+        rows = self.valid_rows()
+        if not len(rows):
+            return {}
+        summary = {}
+        for name in STAGES + ("lateness",):
+            values = rows[:, COLUMNS.index(name)]
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summary[name] = {"p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000,
+                             "max_ms": float(values.max()) * 1000}
+        return summary
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            print("[TRACE] No frames recorded.")
+            return
+        print(f"[TRACE] {min(self.count, self.capacity)} frames (of {self.count} presented)")
+        print(f"[TRACE] {'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, stats in summary.items():
+            print(f"[TRACE] {name:<10}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        rows = self.valid_rows()
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(COLUMNS)
+                writer.writerows(rows.tolist())
+        else:
+            with open(path, "w") as f:
+                json.dump({"columns": COLUMNS, "rows": rows.tolist(), "summary": self.summary()}, f)
+        print(f"[TRACE] Playback trace written: {path}")
+
+
+def trace_from_config(config, start_time):
+    """Returns (trace, dump_path) if playback tracing is enabled in user_config, else (None, None)."""
+    trace_config = config.get("playback_trace", {})
+    if not trace_config.get("enabled", False):
+        return None, None
+    folder = trace_config.get("folder", "traces")
+    extension = "csv" if trace_config.get("format", "json") == "csv" else "json"
+    path = os.path.join(folder, f"playback_{start_time.strftime('%Y-%m-%d_%H-%M-%S')}.{extension}")
+    return PlaybackTrace(trace_config.get("capacity", 36000)), path
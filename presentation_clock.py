@@ -0,0 +1,142 @@
+import time
+
+from motion_estimator import MotionEstimator
+
+
+class PresentationClock:
+    """
+    Monotonic presentation scheduler for video playback.
+
+    The media position advances at wall-clock rate multiplied by the current
+    speed ratio, so each frame's due time follows the cumulative ratio rather
+    than a fixed per-frame sleep. Frames whose successor is already due are
+    dropped; if the decoder falls behind the previous frame stays on screen
+    (a repeat).
+    """
+
+    def __init__(self, fps, max_consecutive_drops=5, min_ratio=0.1):
+        self.fps = fps
+        self.frame_interval = 1.0 / fps
+        self.max_consecutive_drops = max_consecutive_drops
+        self.min_ratio = min_ratio
+        self.ratio = 1.0
+        self.media_time = 0.0
+        self.last_tick = None
+        self.consecutive_drops = 0
+        self.starved_index = None
+
+        # Counters
+        self.presented_frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self.repeated_frames = 0
+        self.drift = 0.0
+        self.max_drift = 0.0
+
+    def start(self, now=None):
+        self.last_tick = time.monotonic() if now is None else now
+
+    def advance(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.media_time += (now - self.last_tick) * self.ratio
+        self.last_tick = now
+        return self.media_time
+
+    def set_ratio(self, ratio, now=None):
+        # Integrate up to now with the old ratio before switching
+        self.advance(now)
+        self.ratio = max(ratio, self.min_ratio)
+
+    def frame_time(self, frame_index):
+        return frame_index * self.frame_interval
+
+    def position(self, now=None):
+        # Fractional frame index that should be on screen right now
+        return self.advance(now) * self.fps
+
+    def time_until(self, frame_index, now=None):
+        media_now = self.advance(now)
+        return (self.frame_time(frame_index) - media_now) / self.ratio
+
+    def should_drop(self, frame_index, now=None):
+        if self.position(now) < frame_index + 1:
+            self.consecutive_drops = 0
+            return False
+        if self.consecutive_drops >= self.max_consecutive_drops:
+            # Show something rather than freezing when decode can't keep up
+            self.consecutive_drops = 0
+            return False
+        self.consecutive_drops += 1
+        self.dropped_frames += 1
+        return True
+
+    def mark_presented(self, frame_index, now=None):
+        self.presented_frames += 1
+        self.drift = (self.position(now) - frame_index) * self.frame_interval
+        self.max_drift = max(self.max_drift, abs(self.drift))
+        if self.drift > self.frame_interval:
+            self.late_frames += 1
+
+    def mark_starved(self, next_index, now=None):
+        # Decoder had nothing ready; count once per frame slot that was missed
+        if self.position(now) >= next_index and self.starved_index != next_index:
+            self.starved_index = next_index
+            self.repeated_frames += 1
+
+    def stats(self):
+        return {
+            "presented": self.presented_frames,
+            "dropped": self.dropped_frames,
+            "late": self.late_frames,
+            "repeated": self.repeated_frames,
+            "drift_s": round(self.drift, 4),
+            "max_drift_s": round(self.max_drift, 4),
+        }
+
+
+class DistanceLockedClock(PresentationClock):
+    """
+    Presentation clock driven by the treadmill's cumulative distance.
+
+    The frame on screen is looked up from the route's frame <-> distance
+    index. Between ~1 Hz FTMS samples the distance comes from a
+    MotionEstimator, so scenery keeps moving. With a shared estimator (fed
+    straight from the treadmill samples) set_speed/set_distance are ignored.
+    """
+
+    def __init__(self, route, fps, max_extrapolation=1.5, motion=None, **kwargs):
+        super().__init__(fps, **kwargs)
+        self.route = route
+        self.owns_motion = motion is None
+        self.motion = motion if motion is not None else MotionEstimator(max_extrapolation)
+        self.speed_kmh = 0.0
+
+    @property
+    def speed_mps(self):
+        return self.motion.speed_mps
+
+    def set_ratio(self, ratio, now=None):
+        pass  # Distance decides the frame, not the speed ratio
+
+    def set_speed(self, speed_kmh, now=None):
+        self.speed_kmh = speed_kmh
+        if self.owns_motion:
+            self.motion.set_speed(speed_kmh, now)
+
+    def set_distance(self, distance_km, now=None):
+        if self.owns_motion:
+            self.motion.update(distance_km, self.speed_kmh, now)
+
+    def current_distance_m(self, now=None):
+        return self.motion.distance_at(now)
+
+    def position(self, now=None):
+        return self.route.frame_for_distance(self.current_distance_m(now))
+
+    def time_until(self, frame_index, now=None):
+        remaining_m = self.route.distance_for_frame(frame_index) - self.current_distance_m(now)
+        if remaining_m <= 0:
+            return 0.0
+        if self.speed_mps <= 0:
+            return self.frame_interval  # Belt stopped; check again next frame slot
+        return min(remaining_m / self.speed_mps, self.frame_interval)
@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class RaceField:
+    """
+    A mass-start field of simulated runners, e.g. a parkrun.
+
+    Finish times are lognormal around a median pace. Each runner's speed
+    changes linearly through the race by their own split factor (positive =
+    slowing down), so distance is a closed-form quadratic in time and the
+    whole field is evaluated in one vectorised pass per tick into
+    preallocated arrays. The field is kept ordered between ticks; as the
+    order barely changes from one tick to the next, re-sorting the nearly
+    sorted order is cheap.
+    """
+
+    def __init__(self, distance_km, finish_s, split, neighbours=2):
+        self.distance_m = distance_km * 1000.0
+        self.size = len(finish_s)
+        self.neighbours = neighbours
+        self.finish_s = np.asarray(finish_s, dtype=np.float64)
+        self.split = np.asarray(split, dtype=np.float64)
+        self.avg_mps = self.distance_m / self.finish_s
+
+        # Per-tick work buffers
+        self.distance = np.zeros(self.size)
+        self.scratch = np.empty(self.size)
+        self.order = np.argsort(self.finish_s)  # Fastest first: the order at any t > 0
+        self.sorted_negative = np.empty(self.size)  # -distance in field order
+
+    @classmethod
+    def generate(cls, distance_km, runners=400, median_pace_min_per_km=6.0, sigma=0.18,
+                 fastest_pace_min_per_km=2.9, split_mean=0.03, split_sd=0.04, neighbours=2, seed=None):
+        rng = np.random.default_rng(seed)
+        median_s = median_pace_min_per_km * 60 * distance_km
+        fastest_s = fastest_pace_min_per_km * 60 * distance_km
+        finish_s = np.maximum(median_s * rng.lognormal(0.0, sigma, runners), fastest_s)
+        split = np.clip(rng.normal(split_mean, split_sd, runners), -0.3, 0.3)
+        return cls(distance_km, finish_s, split, neighbours)
+
+    def distances_at(self, elapsed_seconds):
+        # d(t) = v_avg * (t + s * t * (1 - t / T)), capped at the finish; v(t) = v_avg * (1 + s * (1 - 2t / T))
+        t = max(elapsed_seconds, 0.0)
+        np.divide(t, self.finish_s, out=self.scratch)
+        np.subtract(1.0, self.scratch, out=self.scratch)
+        np.multiply(self.scratch, self.split, out=self.scratch)
+        self.scratch += 1.0
+        np.multiply(self.scratch, t, out=self.scratch)
+        np.multiply(self.scratch, self.avg_mps, out=self.distance)
+        np.minimum(self.distance, self.distance_m, out=self.distance)
+        return self.distance
+
+    def speed_kmh(self, runner, elapsed_seconds):
+        if elapsed_seconds >= self.finish_s[runner]:
+            return 0.0
+        ratio = 1 + self.split[runner] * (1 - 2 * elapsed_seconds / self.finish_s[runner])
+        return float(self.avg_mps[runner] * ratio * 3.6)
+
+    def standing(self, elapsed_seconds, user_distance_m):
+        """
+        Returns (position, field_size, ahead, behind) for the user, where
+        ahead/behind are up to `neighbours` (runner, gap_m) pairs, nearest
+        first, gap_m being user minus runner distance.
+        """
+        distance = self.distances_at(elapsed_seconds)
+        np.take(distance, self.order, out=self.sorted_negative)
+        np.negative(self.sorted_negative, out=self.sorted_negative)
+        if np.any(self.sorted_negative[1:] < self.sorted_negative[:-1]):
+            self.order = self.order[np.argsort(self.sorted_negative, kind="stable")]
+            np.take(distance, self.order, out=self.sorted_negative)
+            np.negative(self.sorted_negative, out=self.sorted_negative)
+
+        # Negated so it ascends: the insertion point is the number of runners strictly ahead
+        ahead_count = int(np.searchsorted(self.sorted_negative, -user_distance_m, side="left"))
+        ahead = [(int(r), user_distance_m - float(distance[r]))
+                 for r in self.order[max(ahead_count - self.neighbours, 0):ahead_count][::-1]]
+        behind = [(int(r), user_distance_m - float(distance[r]))
+                  for r in self.order[ahead_count:ahead_count + self.neighbours]]
+        return ahead_count + 1, self.size + 1, ahead, behind
+
@@ -0,0 +1,225 @@
+import csv
+import os
+import sys
+
+import numpy as np
+
+from sidecar_cache import atomic_write, is_fresh, write_meta
+
+EARTH_RADIUS_M = 6371000
+
+# Compiled sidecar: one (len(COLUMNS), n_frames) float64 .npy, one contiguous row per column
+COMPILED_VERSION = 1
+COLUMNS = ("frame", "lat", "lon", "ele", "incline", "cum_distance_m")
+
+
+def route_path_for_video(video_path):
+    return os.path.splitext(str(video_path))[0] + ".csv"
+
+
+def compiled_paths(csv_path):
+    base = os.path.splitext(str(csv_path))[0]
+    return base + ".route.npy", base + ".route.json"
+
+
+def nominal_distance_km(video_path):
+    # Video names look like "<name>_<speed>_<distance>.mp4"
+    try:
+        parts = os.path.splitext(os.path.basename(str(video_path)))[0].split("_")
+        return float(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def cumulative_distance_m(lat, lon):
+    lat_r = np.radians(lat)
+    lon_r = np.radians(lon)
+    dlat = np.diff(lat_r)
+    dlon = np.diff(lon_r)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat_r[:-1]) * np.cos(lat_r[1:]) * np.sin(dlon / 2) ** 2
+    steps = EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+class RouteData:
+    """
+    Per-frame route columns for a video plus a frame <-> distance index.
+
+    GPS fixes only change every few frames, so the index is built from the
+    frames where cumulative distance actually increases and frame numbers are
+    interpolated linearly between them. Column lookups go through
+    row_for_frame(), since a joined playlist route can skip frame numbers.
+    """
+
+    def __init__(self, frame, lat, lon, ele, incline, cum_distance_m):
+        self.frame = frame
+        self.lat = lat
+        self.lon = lon
+        self.ele = ele
+        self.incline = incline
+        self.cum_distance_m = cum_distance_m
+
+        moving = np.concatenate(([True], np.diff(cum_distance_m) > 0))
+        self.key_distance_m = cum_distance_m[moving]
+        self.key_frame = frame[moving].astype(np.float64)
+
+    @property
+    def frame_count(self):
+        return len(self.frame)
+
+    @property
+    def total_distance_m(self):
+        return float(self.cum_distance_m[-1]) if len(self.cum_distance_m) else 0.0
+
+    def frame_for_distance(self, distance_m):
+        return float(np.interp(distance_m, self.key_distance_m, self.key_frame))
+
+    def distance_for_frame(self, frame_index):
+        return float(np.interp(frame_index, self.key_frame, self.key_distance_m))
+
+    def row_for_frame(self, frame_index):
+        # Frame numbers are not row indices once clips are joined on their video frame counts
+        row = int(np.searchsorted(self.frame, frame_index, side="right")) - 1
+        return min(max(row, 0), len(self.frame) - 1)
+
+    def row_for_distance(self, distance_m):
+        return self.row_for_frame(self.frame_for_distance(distance_m))
+
+    def position_for_distance(self, distance_m):
+        row = self.row_for_distance(distance_m)
+        return float(self.lat[row]), float(self.lon[row])
+
+
+def load_route_csv(csv_path, nominal_km=None):
+    frames, lats, lons, eles, inclines = [], [], [], [], []
+    with open(csv_path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            frames.append(int(row["frame"]))
+            lats.append(float(row["lat"]))
+            lons.append(float(row["lon"]))
+            eles.append(float(row["ele"]))
+            inclines.append(float(row["incline"]))
+
+    lat = np.array(lats, dtype=np.float64)
+    lon = np.array(lons, dtype=np.float64)
+    cum = cumulative_distance_m(lat, lon)
+
+    # GPS jitter inflates the measured length; trust the distance in the video name
+    if nominal_km and cum[-1] > 0:
+        cum *= (nominal_km * 1000) / cum[-1]
+
+    return RouteData(
+        np.array(frames, dtype=np.int64),
+        lat,
+        lon,
+        np.array(eles, dtype=np.float64),
+        np.array(inclines, dtype=np.float64),
+        cum,
+    )
+
+
+def compile_route(csv_path, nominal_km=None, force=False):
+    npy_path, meta_path = compiled_paths(csv_path)
+    if not force and os.path.exists(npy_path) and is_fresh(csv_path, meta_path, COMPILED_VERSION, nominal_km=nominal_km):
+        return npy_path
+
+    print(f"[ROUTE] Compiling {csv_path}...")
+    route = load_route_csv(csv_path, nominal_km)
+    table = np.vstack([
+        route.frame.astype(np.float64),
+        route.lat,
+        route.lon,
+        route.ele,
+        route.incline,
+        route.cum_distance_m,
+    ])
+
+    atomic_write(npy_path, lambda f: np.save(f, table))
+    write_meta(meta_path, csv_path, COMPILED_VERSION, nominal_km=nominal_km, columns=list(COLUMNS), frames=route.frame_count)
+    return npy_path
+
+
+def open_compiled_route(npy_path):
+    # Memory-mapped: columns are views into the file, nothing is parsed
+    table = np.load(npy_path, mmap_mode="r")
+    columns = dict(zip(COLUMNS, table))
+    return RouteData(
+        columns["frame"],
+        columns["lat"],
+        columns["lon"],
+        columns["ele"],
+        columns["incline"],
+        columns["cum_distance_m"],
+    )
+
+
+def load_route_for_video(video_path):
+    csv_path = route_path_for_video(video_path)
+    if not os.path.exists(csv_path):
+        return None
+    try:
+        return open_compiled_route(compile_route(csv_path, nominal_distance_km(video_path)))
+    except Exception as e:
+        print(f"[ROUTE] Could not load route data from {csv_path}: {e}")
+        return None
+
+
+def concatenate_routes(routes, frame_counts=None):
+    """
+    Joins per-clip routes into one whose frame numbers and distances keep
+    counting across clips, matching the global frame index of PlaylistCapture.
+
+    frame_counts are the clips' frame counts as the decoder reports them;
+    PlaylistCapture moves on to the next clip after that many frames, not
+    after the last CSV row, so they take precedence where known.
+    """
+    if len(routes) == 1:
+        return routes[0]
+    frames, distances = [], []
+    frame_offset = 0
+    distance_offset = 0.0
+    for i, route in enumerate(routes):
+        frames.append(np.asarray(route.frame, dtype=np.int64) + frame_offset)
+        distances.append(np.asarray(route.cum_distance_m) + distance_offset)
+        frame_offset += frame_counts[i] if frame_counts and frame_counts[i] > 0 else route.frame_count
+        distance_offset += route.total_distance_m
+    return RouteData(
+        np.concatenate(frames),
+        np.concatenate([route.lat for route in routes]),
+        np.concatenate([route.lon for route in routes]),
+        np.concatenate([route.ele for route in routes]),
+        np.concatenate([route.incline for route in routes]),
+        np.concatenate(distances),
+    )
+
+
+def load_route_for_playlist(video_paths, frame_count=None):
+    # Every clip needs route data, otherwise distance would stop mapping onto frames partway through.
+    # frame_count(path) returns the decoder's frame count for a clip (0 if unknown)
+    routes, counts = {}, {}
+    for path in video_paths:
+        if path not in routes:
+            routes[path] = load_route_for_video(path)
+            if routes[path] is None:
+                return None
+            if frame_count is not None and len(video_paths) > 1:
+                counts[path] = frame_count(path)
+                if counts[path] > 0 and counts[path] != routes[path].frame_count:
+                    print(f"[ROUTE] {os.path.basename(str(path))} has {counts[path]} frames but "
+                          f"{routes[path].frame_count} route rows; offsetting later clips by the video's count")
+    frame_counts = [counts.get(path, 0) for path in video_paths] if counts else None
+    return concatenate_routes([routes[path] for path in video_paths], frame_counts)
+
+
+def compile_all_routes(video_folder="videos"):
+    for file in sorted(os.listdir(video_folder)):
+        if file.lower().endswith(".csv"):
+            csv_path = os.path.join(video_folder, file)
+            try:
+                compile_route(csv_path, nominal_distance_km(csv_path))
+            except Exception as e:
+                print(f"[ROUTE] Failed to compile {file}: {e}")
+
+
+if __name__ == "__main__":
+    compile_all_routes(sys.argv[1] if len(sys.argv) > 1 else "videos")
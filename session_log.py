@@ -0,0 +1,50 @@
+import json
+import os
+from datetime import datetime
+
+SESSION_LOG = os.path.join("TCX", "sessions.jsonl")
+
+
+def record_session(tcx_path, routine_name, video_path, start_time, final_distance_km, log_path=SESSION_LOG, **extra):
+    # One JSON object per line, appended, so a crash can only ever lose the last record
+    record = {
+        "tcx": str(tcx_path),
+        "routine": routine_name,
+        "video": str(video_path),
+        "start_time": start_time.isoformat() if isinstance(start_time, datetime) else start_time,
+        "final_distance_km": final_distance_km,
+        **extra,
+    }
+    os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def load_sessions(log_path=SESSION_LOG):
+    sessions = []
+    try:
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    sessions.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return sessions
+
+
+def last_runs_by_routine(log_path=SESSION_LOG):
+    """Maps routine name -> TCX path of its most recent session whose file still exists."""
+    last_runs = {}
+    for session in load_sessions(log_path):
+        if session.get("routine") and os.path.exists(session.get("tcx", "")):
+            last_runs[session["routine"]] = session["tcx"]
+    return last_runs
+
+
+def session_for_tcx(tcx_path, log_path=SESSION_LOG):
+    for session in reversed(load_sessions(log_path)):
+        if os.path.normpath(session.get("tcx", "")) == os.path.normpath(str(tcx_path)):
+            return session
+    return None
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def atomic_write(path, writer, mode="wb"):
+    # writer(f) fills a temporary file that then replaces path, so readers never see it half-written
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode) as f:
+        writer(f)
+    os.replace(tmp_path, path)
+
+
+def load_meta(meta_path):
+    try:
+        with open(meta_path, "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def write_meta(meta_path, source_path, version, source_hash=None, **extra):
+    st = os.stat(source_path)
+    meta = {
+        "version": version,
+        "source_mtime": st.st_mtime,
+        "source_size": st.st_size,
+        "source_sha1": source_hash or file_hash(source_path),
+        **extra,
+    }
+    atomic_write(meta_path, lambda f: json.dump(meta, f, indent=2), mode="w")
+    return meta
+
+
+def is_fresh(source_path, meta_path, version, **expected):
+    """
+    True if the compiled sidecar described by meta_path still matches its source.
+
+    A matching mtime and size is trusted as-is. If the mtime moved (copied
+    files, touched files) the content hash decides, and the metadata is
+    refreshed so the next check is cheap again.
+    """
+    meta = load_meta(meta_path)
+    if not meta or meta.get("version") != version:
+        return False
+    if any(meta.get(key) != value for key, value in expected.items()):
+        return False
+
+    st = os.stat(source_path)
+    if meta.get("source_mtime") == st.st_mtime and meta.get("source_size") == st.st_size:
+        return True
+
+    source_hash = file_hash(source_path)
+    if source_hash != meta.get("source_sha1"):
+        return False
+    extra = {k: v for k, v in meta.items() if not k.startswith("source_") and k != "version"}
+    write_meta(meta_path, source_path, version, source_hash=source_hash, **extra)
+    return True
@@ -0,0 +1,121 @@
+import os
+import sys
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import numpy as np
+
+from sidecar_cache import atomic_write, is_fresh, write_meta
+
+TCX_DIR = "TCX"
+TCX_NS = "{http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2}"
+
+# Compiled sidecar: a (2, n_points) float64 .npy of elapsed seconds and distance in metres
+COMPILED_VERSION = 2
+
+
+def compiled_paths(tcx_path):
+    base = os.path.splitext(str(tcx_path))[0]
+    return base + ".ghost.npy", base + ".ghost.json"
+
+
+def parse_tcx_track(tcx_path):
+    # Streams the XML; only Time and DistanceMeters of each Trackpoint are kept
+    times, distances = [], []
+    start = None
+    try:
+        for _, elem in ET.iterparse(tcx_path, events=("end",)):
+            if elem.tag != TCX_NS + "Trackpoint":
+                continue
+            time_elem = elem.find(TCX_NS + "Time")
+            dist_elem = elem.find(TCX_NS + "DistanceMeters")
+            if time_elem is not None and dist_elem is not None:
+                timestamp = datetime.fromisoformat(time_elem.text.replace("Z", "+00:00"))
+                start = start or timestamp
+                times.append((timestamp - start).total_seconds())
+                distances.append(float(dist_elem.text))
+            elem.clear()
+    except ET.ParseError as e:
+        # A workout that was cut short can leave its Lap/Track unclosed; the points before that still count
+        if not times:
+            raise
+        print(f"[GHOST] {tcx_path} is truncated ({e}); using its first {len(times)} trackpoints")
+
+    track = np.array([times, distances], dtype=np.float64).reshape(2, -1)
+    if track.shape[1]:
+        # Trackpoints can repeat a second or dip on a reconnect; keep both columns non-decreasing
+        np.maximum.accumulate(track[0], out=track[0])
+        # Distances are rebased like the times: a resumed export or cumulative watch log doesn't start at 0
+        track[1] -= track[1, 0]
+        np.maximum.accumulate(track[1], out=track[1])
+    return track
+
+
+def compile_tcx_ghost(tcx_path, force=False):
+    npy_path, meta_path = compiled_paths(tcx_path)
+    if not force and os.path.exists(npy_path) and is_fresh(tcx_path, meta_path, COMPILED_VERSION):
+        return npy_path
+
+    print(f"[GHOST] Compiling {tcx_path}...")
+    track = parse_tcx_track(tcx_path)
+    atomic_write(npy_path, lambda f: np.save(f, track))
+    write_meta(meta_path, tcx_path, COMPILED_VERSION, points=int(track.shape[1]),
+               distance_m=float(track[1, -1]) if track.shape[1] else 0.0)
+    return npy_path
+
+
+class ReplayProfile:
+    """
+    A recorded run as a ghost: the exact time -> distance track of a TCX.
+
+    Same queries as GhostProfile. Distance is interpolated between the
+    recorded trackpoints (one a second), speed is the slope of the segment
+    the ghost is on, and the ghost stops at its final distance.
+    """
+
+    def __init__(self, times, distances):
+        self.times = times
+        self.distances = distances
+
+    def distance_at(self, elapsed_seconds):
+        return float(np.interp(elapsed_seconds, self.times, self.distances))
+
+    def speed_at(self, elapsed_seconds):
+        i = int(np.searchsorted(self.times, elapsed_seconds, side="right"))
+        if i <= 0 or i >= len(self.times):
+            return 0.0
+        dt = self.times[i] - self.times[i - 1]
+        return float((self.distances[i] - self.distances[i - 1]) / dt * 3.6) if dt > 0 else 0.0
+
+
+def load_tcx_ghost(tcx_path):
+    """Returns a ReplayProfile for a TCX file, or None if it can't be used."""
+    try:
+        track = np.load(compile_tcx_ghost(tcx_path), mmap_mode="r")
+    except Exception as e:
+        print(f"[GHOST] Could not load {tcx_path}: {e}")
+        return None
+    if track.shape[1] < 2:
+        print(f"[GHOST] {tcx_path} has no usable trackpoints")
+        return None
+    return ReplayProfile(track[0], track[1])
+
+
+def replay_ghost_name(tcx_path):
+    # "workout_2025-06-01_07-30-00.tcx" -> "Replay 2025-06-01"
+    stem = os.path.splitext(os.path.basename(str(tcx_path)))[0]
+    parts = stem.split("_")
+    return f"Replay {parts[1]}" if len(parts) > 1 else f"Replay {stem}"
+
+
+def compile_all_tcx(tcx_folder=TCX_DIR):
+    for file in sorted(os.listdir(tcx_folder)):
+        if file.lower().endswith(".tcx"):
+            try:
+                compile_tcx_ghost(os.path.join(tcx_folder, file))
+            except Exception as e:
+                print(f"[GHOST] Failed to compile {file}: {e}")
+
+
+if __name__ == "__main__":
+    compile_all_tcx(sys.argv[1] if len(sys.argv) > 1 else TCX_DIR)
@@ -12,7 +12,9 @@ track_file = None
 lap_start_time = None
 lap_start_distance = 0.0
 lap_index = 0
+track_open = False
 gps_track = []  # List of (distance_m, lat, lon)
+route_data = None  # Compiled video route (see route_data.py), preferred over gps_track
 
 def load_gpx_track(gpx_path):
     import xml.etree.ElementTree as ET
@@ -44,6 +46,11 @@ def load_gpx_track(gpx_path):
     return track
 
 def interpolate_gps(distance_m):
+    if route_data is not None:
+        if distance_m > route_data.total_distance_m:
+            return None, None
+        lat, lon = route_data.position_for_distance(distance_m)
+        return lat, lon
     if not gps_track or distance_m < gps_track[0][0] or distance_m > gps_track[-1][0]:
         return None, None
     for i in range(len(gps_track) - 1):
@@ -56,13 +63,14 @@ def interpolate_gps(distance_m):
             return lat, lon
     return gps_track[-1][1], gps_track[-1][2]
 
-def start_tcx_file(start_time: datetime, gpx_path: Optional[str] = None):
-    global tcx_filename, track_file, lap_index, gps_track
+def start_tcx_file(start_time: datetime, gpx_path: Optional[str] = None, route=None):
+    global tcx_filename, track_file, lap_index, gps_track, route_data
 
     os.makedirs("TCX", exist_ok=True)
     tcx_filename = f"TCX/workout_{start_time.strftime('%Y-%m-%d_%H-%M-%S')}.tcx"
     lap_index = 0
 
+    route_data = route
     if gpx_path and os.path.exists(gpx_path):
         gps_track = load_gpx_track(gpx_path)
 
@@ -75,12 +83,14 @@ def start_tcx_file(start_time: datetime, gpx_path: Optional[str] = None):
 ''')
 
     track_file = open(tcx_filename, 'a', encoding='utf-8')
+    return tcx_filename
 
 def start_new_lap(start_time: datetime, start_distance_km: float):
-    global track_file, lap_start_time, lap_start_distance, lap_index
+    global track_file, lap_start_time, lap_start_distance, lap_index, track_open
     lap_start_time = start_time
     lap_start_distance = start_distance_km
     lap_index += 1
+    track_open = True
 
     track_file.write(f'''      <Lap StartTime="{start_time.isoformat()}">
         <TotalTimeSeconds>0</TotalTimeSeconds>
@@ -121,8 +131,17 @@ def append_tcx_trackpoint(timestamp: datetime, speed_kmh: float, distance_km: fl
           </Trackpoint>
 ''')
 
+def mark_track_gap():
+    # A sensor outage: end the current Track and start another, so readers don't join the points across it
+    global track_file
+    if track_open:
+        track_file.write('''        </Track>
+        <Track>
+''')
+
 def finalize_lap(end_time: datetime, end_distance_km: float):
-    global track_file, lap_start_time, lap_start_distance
+    global track_file, lap_start_time, lap_start_distance, track_open
+    track_open = False
 
     total_time = (end_time - lap_start_time).total_seconds()
     total_distance_m = (end_distance_km - lap_start_distance) * 1000
@@ -1,7 +1,11 @@
 import asyncio
+import json
+import os
 import platform
+from enum import IntEnum
 from bleak import BleakScanner, BleakClient
 from log_simulator import simulate_from_log  # only used when testing
+from sidecar_cache import atomic_write
 
 ftms_service_uuid = "00001826-0000-1000-8000-00805f9b34fb"
 control_point_uuid = "00002AD9-0000-1000-8000-00805f9b34fb"
@@ -10,15 +14,126 @@ treadmill_data_uuid = "00002ACD-0000-1000-8000-00805f9b34fb"
 heart_rate_service_uuid = "0000180D-0000-1000-8000-00805f9b34fb"
 heart_rate_measurement_uuid = "00002A37-0000-1000-8000-00805f9b34fb"
 
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_config.json")
+
+RESPONSE_OP_CODE = 0x80
+
+
+class ControlOpCode(IntEnum):
+    REQUEST_CONTROL = 0x00
+    SET_TARGET_SPEED = 0x02
+    SET_TARGET_INCLINE = 0x03
+    START_OR_RESUME = 0x07
+    STOP_OR_PAUSE = 0x08
+
+
+class ResultCode(IntEnum):
+    SUCCESS = 0x01
+    NOT_SUPPORTED = 0x02
+    INVALID_PARAMETER = 0x03
+    OPERATION_FAILED = 0x04
+    CONTROL_NOT_PERMITTED = 0x05
+    TIMEOUT = 0xFF  # Local: no response arrived in time
+
+    @classmethod
+    def from_byte(cls, value):
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.OPERATION_FAILED
+
+
+def load_ble_devices(config_path=CONFIG_PATH):
+    try:
+        with open(config_path, "r") as f:
+            return json.load(f).get("ble_devices", {})
+    except Exception:
+        return {}
+
+
+def save_ble_device(role, address, name=None, config_path=CONFIG_PATH):
+    # Remembered so the next start can connect directly instead of scanning
+    try:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    except Exception as e:
+        print(f"[BLE] Not saving {role} address; could not read {config_path}: {e}")
+        return
+    devices = config.setdefault("ble_devices", {})
+    if devices.get(role, {}).get("address") == address:
+        return
+    devices[role] = {"address": address, "name": name}
+    # user_config.json also holds PB and goal times, so never leave it half-written
+    atomic_write(config_path, lambda f: json.dump(config, f, indent=2), mode="w")
+
+
+def is_treadmill(device, adv_data, target_name=None, target_address=None):
+    if ftms_service_uuid.lower() in [uuid.lower() for uuid in adv_data.service_uuids]:
+        return True
+    if target_name and device.name == target_name:
+        return True
+    return bool(target_address and device.address.lower() == target_address.lower())
+
+
+def is_heart_rate_monitor(device, adv_data):
+    return heart_rate_service_uuid.lower() in [uuid.lower() for uuid in adv_data.service_uuids]
+
+
+async def scan_for_devices(matchers, required=(), timeout=10.0, grace=2.0):
+    """
+    One BLE scan serving several lookups: matchers maps role -> predicate(device, adv_data).
+    Stops as soon as every role is found, or `grace` seconds after the required ones are,
+    instead of running a fixed-length discovery. Returns role -> BLEDevice for what was found.
+    """
+    found = {}
+    all_found = asyncio.Event()
+    required_found = asyncio.Event()
+
+    def detection_callback(device, adv_data):
+        for role, matches in matchers.items():
+            if role not in found and matches(device, adv_data):
+                found[role] = device
+                print(f"[BLE] Found {role}: {device.name or 'Unknown'} ({device.address})")
+        if all(role in found for role in required):
+            required_found.set()
+        if len(found) == len(matchers):
+            all_found.set()
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    scanner = BleakScanner(detection_callback=detection_callback)
+    await scanner.start()
+    try:
+        try:
+            await asyncio.wait_for(required_found.wait(), timeout)
+            await asyncio.wait_for(all_found.wait(), max(min(grace, deadline - loop.time()), 0))
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        await scanner.stop()
+    return found
+
+
 class TreadmillControl:
     def __init__(self, testing=None, log_path="treadmill_log.json"):
         self.client = None
         self.testing = platform.system() == "Windows" if testing is None else testing
         self.log_path = log_path
         self.current_speed = 0.0
+        self.current_incline = 0.0
         self.start_time = None
         self.hr_client = None
         self.latest_hr = None
+        self.scanned_hr = None  # HR strap spotted during the treadmill scan
+        self.hr_task = None  # In-flight HR connect; only one may scan at a time
+        self.address = None
+        self.data_callback = None  # Kept so a reconnect can restore the data subscription
+        self.response_timeout = 2.0
+        self.pending_responses = {}  # opcode -> future resolved by its control point indication
+        self.control_lock = asyncio.Lock()
+        self.scheduler = None  # Optional ControlPointScheduler (control_scheduler.py) that coalesces commands
 
     async def connect(self, target_name=None, target_address=None):
         if self.testing:
@@ -26,64 +141,79 @@ class TreadmillControl:
             self.client = "SimulatedClient"
             return
 
+        cached = load_ble_devices()
+        cached_address = target_address or cached.get("treadmill", {}).get("address")
+        hr_cached = bool(cached.get("heart_rate", {}).get("address"))
+        self.scanned_hr = None
+
         for attempt in range(6):
             try:
                 print(f"BLE connection attempt {attempt + 1}")
-                devices = await BleakScanner.discover(return_adv=True)
-
-                treadmill = None
-                for device, adv_data in devices.values():
-                    print(f"- {device.name or 'Unknown'} ({device.address})")
-
-                    if ftms_service_uuid in adv_data.service_uuids:
-                        treadmill = device
-                        print("Found FTMS treadmill.")
-                        break
-                    if target_name and device.name == target_name:
-                        treadmill = device
-                        print(f"Matched treadmill by name: {target_name}")
-                        break
-                    if target_address and device.address.lower() == target_address.lower():
-                        treadmill = device
-                        print(f"Matched treadmill by address: {target_address}")
-                        break
-
-                if treadmill:
-                    self.client = BleakClient(treadmill.address)
-                    await self.client.connect()
-                    print(f"Connected to {treadmill.name or 'Unknown'} ({treadmill.address})")
-                    break
+                if attempt == 0 and cached_address:
+                    # Last known treadmill: connect directly, no scan
+                    address, name = cached_address, cached.get("treadmill", {}).get("name")
+                else:
+                    # One scan for the treadmill and, if we don't know it yet, the HR strap as well
+                    matchers = {"treadmill": lambda d, a: is_treadmill(d, a, target_name, target_address)}
+                    if not hr_cached:
+                        matchers["heart_rate"] = is_heart_rate_monitor
+                    found = await scan_for_devices(matchers, required=("treadmill",))
+                    self.scanned_hr = found.get("heart_rate") or self.scanned_hr
+                    if "treadmill" not in found:
+                        print("No FTMS treadmill found.")
+                        continue
+                    address, name = found["treadmill"].address, found["treadmill"].name
+
+                self.client = BleakClient(address)
+                await self.client.connect()
+                print(f"Connected to {name or 'Unknown'} ({address})")
+                self.address = address
+                save_ble_device("treadmill", address, name)
+                await self.subscribe_control_point()
+                break
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed: {e}")
                 await asyncio.sleep(2)
         else:
             raise Exception("Failed to connect after 6 attempts.")
 
-        asyncio.create_task(self.try_connect_hr_monitor())
+        self.hr_task = asyncio.create_task(self.try_connect_hr_monitor())
 
     async def try_connect_hr_monitor(self):
+        cached = load_ble_devices().get("heart_rate", {})
         for attempt in range(3):
             try:
                 print(f"[HR] Attempting to connect to heart rate monitor (try {attempt + 1})...")
-                devices = await BleakScanner.discover()
-                for d in devices:
-                    if heart_rate_service_uuid.lower() in [uuid.lower() for uuid in d.metadata.get("uuids", [])]:
-                        self.hr_client = BleakClient(d.address)
-                        await self.hr_client.connect()
-                        print(f"[HR] Connected to {d.name} ({d.address})")
-
-                        def handle_hr_notification(_, data: bytearray):
-                            print(f"[HR] Raw bytes: {list(data)}")  # 👈 DEBUG LINE
-                            if len(data) > 1:
-                                self.latest_hr = data[1]
-                                print(f"[HR] Heart Rate: {self.latest_hr} bpm")
-
-                        await self.hr_client.start_notify(heart_rate_measurement_uuid, handle_hr_notification)
-                        return
-                print("[HR] No heart rate monitor found.")
+                if attempt == 0 and cached.get("address"):
+                    address, name = cached["address"], cached.get("name")
+                elif self.scanned_hr is not None:
+                    # Already seen during the treadmill scan
+                    address, name = self.scanned_hr.address, self.scanned_hr.name
+                    self.scanned_hr = None
+                else:
+                    found = await scan_for_devices({"heart_rate": is_heart_rate_monitor}, required=("heart_rate",))
+                    if "heart_rate" not in found:
+                        print("[HR] No heart rate monitor found.")
+                        await asyncio.sleep(2)
+                        continue
+                    address, name = found["heart_rate"].address, found["heart_rate"].name
+
+                self.hr_client = BleakClient(address)
+                await self.hr_client.connect()
+                print(f"[HR] Connected to {name} ({address})")
+                save_ble_device("heart_rate", address, name)
+
+                def handle_hr_notification(_, data: bytearray):
+                    print(f"[HR] Raw bytes: {list(data)}")  # 👈 DEBUG LINE
+                    if len(data) > 1:
+                        self.latest_hr = data[1]
+                        print(f"[HR] Heart Rate: {self.latest_hr} bpm")
+
+                await self.hr_client.start_notify(heart_rate_measurement_uuid, handle_hr_notification)
+                return
             except Exception as e:
                 print(f"[HR] Connection attempt {attempt + 1} failed: {e}")
-            await asyncio.sleep(2)
+                await asyncio.sleep(2)
         print("[HR] Giving up on heart rate monitor connection.")
 
     async def disconnect(self):
@@ -96,51 +226,97 @@ class TreadmillControl:
         if self.hr_client:
             await self.hr_client.disconnect()
 
+    async def reconnect(self):
+        """
+        Re-establishes a dropped treadmill link to the same address: restores the
+        control point and data subscriptions, takes control again and re-applies the
+        current target speed and incline, which the treadmill may have dropped.
+        """
+        if self.client is not None:
+            try:
+                await self.client.disconnect()
+            except Exception:
+                pass
+        self.client = BleakClient(self.address)
+        await self.client.connect()
+        print(f"Reconnected to treadmill ({self.address})")
+        await self.subscribe_control_point()
+        if self.data_callback is not None:
+            await self.client.start_notify(treadmill_data_uuid, self.data_callback)
+        await self.request_control()
+        await self.set_speed(self.current_speed)
+        await self.set_incline(self.current_incline)
+
+    async def subscribe_control_point(self):
+        # One indication subscription for the whole session; responses resolve pending futures by opcode
+        await self.client.start_notify(control_point_uuid, self.handle_control_response)
+
+    def handle_control_response(self, sender, data):
+        if len(data) < 3 or data[0] != RESPONSE_OP_CODE:
+            return
+        request_op_code = data[1]
+        result = ResultCode.from_byte(data[2])
+        future = self.pending_responses.pop(request_op_code, None)
+        if future is None:
+            print(f"Unexpected response for operation {request_op_code}: {result.name}")
+            return
+        if not future.done():
+            future.get_loop().call_soon_threadsafe(_resolve, future, result)
+
+    async def send_command(self, op_code, payload=b""):
+        """Writes a control point command and returns its ResultCode (TIMEOUT if no response arrives)."""
+        if self.testing:
+            return ResultCode.SUCCESS
+
+        # FTMS allows one procedure in flight on the control point, so commands are serialised
+        async with self.control_lock:
+            future = asyncio.get_running_loop().create_future()
+            self.pending_responses[op_code] = future
+            try:
+                await self.client.write_gatt_char(control_point_uuid, bytearray([op_code]) + payload, response=True)
+                result = await asyncio.wait_for(future, self.response_timeout)
+            except asyncio.TimeoutError:
+                result = ResultCode.TIMEOUT
+            finally:
+                self.pending_responses.pop(op_code, None)
+
+        if result != ResultCode.SUCCESS:
+            print(f"Operation {ControlOpCode(op_code).name} failed: {result.name}")
+        return result
+
+    async def command(self, op_code, payload=b""):
+        # Through the scheduler's latest-wins mailbox when one is running, otherwise written directly
+        if self.scheduler is not None:
+            return await self.scheduler.submit(op_code, payload)
+        return await self.send_command(op_code, payload)
+
     async def request_control(self):
         if self.testing:
             print("Simulated control request.")
-            return
-        await self.client.write_gatt_char(control_point_uuid, bytearray([0x00]))
-        await self.wait_for_response()
+            return ResultCode.SUCCESS
+        return await self.send_command(ControlOpCode.REQUEST_CONTROL)
 
     async def set_speed(self, speed_kmh):
         self.current_speed = speed_kmh
         if self.testing:
             speed_mph = round(speed_kmh / 1.59, 2)
             print(f"Simulated setting speed to {speed_kmh:.2f} km/h ({speed_mph:.2f} mph)")
-            return
+            return ResultCode.SUCCESS
         speed_mph = round(speed_kmh / 1.59, 2)
         speed_value = int(speed_mph * 100).to_bytes(2, byteorder='little')
-        await self.client.write_gatt_char(control_point_uuid, bytearray([0x02]) + speed_value)
+        result = await self.command(ControlOpCode.SET_TARGET_SPEED, speed_value)
         print(f"Set speed to {speed_kmh:.2f} km/h ({speed_mph:.2f} mph)")
-        await self.wait_for_response()
+        return result
 
     async def set_incline(self, incline):
+        self.current_incline = incline
         if self.testing:
             print(f"Simulated setting incline to {incline:.1f} %")
-            return
+            return ResultCode.SUCCESS
         incline_value = int(incline * 10).to_bytes(2, byteorder='little', signed=True)
-        await self.client.write_gatt_char(control_point_uuid, bytearray([0x03]) + incline_value)
+        result = await self.command(ControlOpCode.SET_TARGET_INCLINE, incline_value)
         print(f"Set incline to {incline:.1f} %")
-        await self.wait_for_response()
-
-    async def wait_for_response(self):
-        if self.testing:
-            print("Simulated waiting for response.")
-            return
-
-        def handle_response(sender, data):
-            op_code = data[0]
-            request_op_code = data[1]
-            result_code = data[2]
-            if result_code == 0x01:
-                print(f"Operation {request_op_code} succeeded")
-            else:
-                print(f"Operation {request_op_code} failed with result code {result_code}")
-
-        await self.client.start_notify(control_point_uuid, handle_response)
-        await asyncio.sleep(1)
-        await self.client.stop_notify(control_point_uuid)
+        return result
 
     async def start_monitoring(self, callback):
         if self.testing:
@@ -148,6 +324,7 @@ class TreadmillControl:
             asyncio.create_task(simulate_from_log(callback, self.log_path))
             return
 
+        self.data_callback = callback
         if self.client:
             await self.client.start_notify(treadmill_data_uuid, callback)
 
@@ -167,90 +344,10 @@ class TreadmillControl:
     async def start_or_resume(self):
         if self.testing:
             print("Simulated FTMS start/resume command.")
-            return
-        await self.client.write_gatt_char(control_point_uuid, bytearray([0x07]))
-        await self.wait_for_response()
-
-def parse_treadmill_data(data: bytes, hr_value=None):
-    flags = int.from_bytes(data[0:2], byteorder='little')
-    idx = 2
-
-    def read_uint8():
-        nonlocal idx
-        val = data[idx]
-        idx += 1
-        return val
-
-    def read_uint16():
-        nonlocal idx
-        val = int.from_bytes(data[idx:idx+2], 'little')
-        idx += 2
-        return val
-
-    def read_sint16():
-        nonlocal idx
-        val = int.from_bytes(data[idx:idx+2], 'little', signed=True)
-        idx += 2
-        return val
-
-    def read_uint24():
-        nonlocal idx
-        val = int.from_bytes(data[idx:idx+3] + b'\x00', 'little')
-        idx += 3
-        return val
-
-    parsed = {}
-
-    if (flags & 0x01) == 0:
-        parsed["speed_kmh"] = read_uint16() / 100.0
-
-    if flags & (1 << 1):
-        parsed["average_speed_kmh"] = read_uint16() / 100.0
-
-    if flags & (1 << 2):
-        parsed["distance_km"] = read_uint24() / 1000.0
-
-    if flags & (1 << 3):
-        parsed["incline_percent"] = read_sint16() / 10.0
-        idx += 2  # Skip Ramp Angle Setting
-
-    if flags & (1 << 4):
-        parsed["positive_elevation_gain_m"] = read_uint16()
-        parsed["negative_elevation_gain_m"] = read_uint16()
-
-    if flags & (1 << 5):
-        parsed["instantaneous_pace_sec_per_km"] = read_uint16()
-
-    if flags & (1 << 6):
-        parsed["average_pace_sec_per_km"] = read_uint16()
-
-    if flags & (1 << 7):
-        parsed["total_energy_kcal"] = read_uint16()
-        parsed["energy_per_hour_kcal"] = read_uint16()
-        parsed["energy_per_minute_kcal"] = read_uint8()
-
-    if flags & (1 << 8):
-        parsed["heart_rate_bpm"] = read_uint8()
-
-    if flags & (1 << 9):
-        parsed["metabolic_equivalent"] = read_uint8() / 10.0
-
-    if flags & (1 << 10):
-        parsed["elapsed_time_s"] = read_uint16()
-
-    if flags & (1 << 11):
-        parsed["remaining_time_s"] = read_uint16()
-
-    if flags & (1 << 12):
-        parsed["force_on_belt_n"] = read_sint16()
-        parsed["power_output_w"] = read_sint16()
+            return ResultCode.SUCCESS
+        return await self.command(ControlOpCode.START_OR_RESUME)
 
-    values = (
-        parsed.get("speed_kmh"),
-        parsed.get("distance_km"),
-        parsed.get("incline_percent"),
-        parsed.get("elapsed_time_s"),
-        parsed.get("heart_rate_bpm") if parsed.get("heart_rate_bpm") is not None else hr_value
-    )
 
-    return values
\ No newline at end of file
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
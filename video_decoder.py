@@ -0,0 +1,318 @@
+"""
+Pluggable video decode backends shared by the player and the video tools.
+
+Every backend exposes the subset of cv2.VideoCapture the code base uses:
+isOpened(), read(image=None), grab(), set_position(frame), release(), plus
+fps / frame_count / width / height attributes. Backends that scale inside
+the decoder also have set_output_size(size). Backends:
+
+  opencv  cv2.VideoCapture, optionally with CAP_PROP_N_THREADS
+  ffmpeg  ffmpeg subprocess piping raw frames; threads, scale and pixel
+          format are applied inside ffmpeg
+  pyav    PyAV (optional dependency) with threaded decoding and in-decoder
+          reformatting
+
+Defaults come from "video_decoder" in user_config.json.
+
+    python video_decoder.py --benchmark [--seconds 10] [--backends opencv,ffmpeg,pyav]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_config.json")
+VIDEO_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "videos")
+CHANNELS = {"bgr24": 3, "rgb24": 3, "gray": 1}
+
+
+def load_decoder_config(config_path=CONFIG_PATH):
+    try:
+        with open(config_path, "r") as f:
+            return json.load(f).get("video_decoder", {})
+    except Exception:
+        return {}
+
+
+class OpenCVDecoder:
+    name = "opencv"
+    native_scaling = False
+
+    def __init__(self, path, threads=0, size=None, pixel_format="bgr24"):
+        self.path = str(path)
+        self.size = tuple(size) if size else None
+        self.pixel_format = pixel_format
+        if threads and hasattr(cv2, "CAP_PROP_N_THREADS"):
+            self.cap = cv2.VideoCapture(self.path, cv2.CAP_ANY, [cv2.CAP_PROP_N_THREADS, threads])
+        else:
+            self.cap = cv2.VideoCapture(self.path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        self.decoded = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        if self.size is None and self.pixel_format == "bgr24":
+            return self.cap.read(image)
+        ret, self.decoded = self.cap.read(self.decoded)
+        if not ret:
+            return False, image
+        frame = self.decoded
+        if self.size is not None:
+            frame = cv2.resize(frame, self.size, dst=image if self.pixel_format == "bgr24" else None)
+        if self.pixel_format == "rgb24":
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=image)
+        elif self.pixel_format == "gray":
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=image)
+        return True, frame
+
+    def grab(self):
+        return self.cap.grab()
+
+    def set_position(self, frame_index):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    def release(self):
+        self.cap.release()
+
+
+def probe_video(path):
+    output = subprocess.check_output([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,avg_frame_rate,nb_frames",
+        "-of", "json", str(path)
+    ])
+    stream = json.loads(output)["streams"][0]
+    num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+    frame_count = stream.get("nb_frames", "0")
+    return int(stream["width"]), int(stream["height"]), fps, int(frame_count) if str(frame_count).isdigit() else 0
+
+
+def probe_frame_count(path):
+    # Container frame count without decoding anything; 0 if the file doesn't say
+    cap = cv2.VideoCapture(str(path))
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if cap.isOpened() else 0
+    finally:
+        cap.release()
+
+
+class FFmpegPipeDecoder:
+    name = "ffmpeg"
+    native_scaling = True
+
+    def __init__(self, path, threads=0, size=None, pixel_format="bgr24"):
+        self.path = str(path)
+        self.threads = threads
+        self.pixel_format = pixel_format
+        src_width, src_height, self.fps, self.frame_count = probe_video(self.path)
+        self.channels = CHANNELS[pixel_format]
+        self._set_size(tuple(size) if size else (src_width, src_height))
+        self.position = 0  # Frames delivered so far, to restart at the same place on a size change
+        self.process = None
+        self._start(0)
+
+    def _set_size(self, size):
+        self.width, self.height = size
+        self.frame_bytes = self.width * self.height * self.channels
+        self.scratch = np.empty(self.frame_bytes, dtype=np.uint8)  # grab() target
+
+    def _start(self, frame_index):
+        self.release()
+        command = ["ffmpeg", "-v", "error", "-nostdin", "-threads", str(self.threads)]
+        if frame_index and self.fps:
+            command += ["-ss", f"{frame_index / self.fps:.3f}"]
+        command += ["-i", self.path, "-an", "-sn",
+                    "-vf", f"scale={self.width}:{self.height}",
+                    "-f", "rawvideo", "-pix_fmt", self.pixel_format, "-"]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=self.frame_bytes)
+        self.position = frame_index
+
+    def _read_into(self, buffer):
+        view = memoryview(buffer).cast("B")
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        self.position += 1
+        return True
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() in (None, 0)
+
+    def read(self, image=None):
+        shape = (self.height, self.width) if self.channels == 1 else (self.height, self.width, self.channels)
+        if image is None or image.shape != shape or image.dtype != np.uint8 or not image.flags.c_contiguous:
+            image = np.empty(shape, dtype=np.uint8)
+        if not self._read_into(image):
+            return False, image
+        return True, image
+
+    def grab(self):
+        return self._read_into(self.scratch)
+
+    def set_position(self, frame_index):
+        self._start(frame_index)
+
+    def set_output_size(self, size):
+        # The scale filter is fixed per process, so restart it where it left off
+        if tuple(size) != (self.width, self.height):
+            self._set_size(tuple(size))
+            self._start(self.position)
+
+    def release(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+class PyAVDecoder:
+    name = "pyav"
+    native_scaling = True
+
+    def __init__(self, path, threads=0, size=None, pixel_format="bgr24"):
+        import av  # Optional dependency
+
+        self.path = str(path)
+        self.pixel_format = pixel_format
+        self.container = av.open(self.path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.stream.thread_count = threads
+        self.fps = float(self.stream.average_rate or 0)
+        self.frame_count = self.stream.frames
+        src_width, src_height = self.stream.codec_context.width, self.stream.codec_context.height
+        self.width, self.height = tuple(size) if size else (src_width, src_height)
+        self.frames = self.container.decode(self.stream)
+
+    def isOpened(self):
+        return self.container is not None
+
+    def read(self, image=None):
+        try:
+            frame = next(self.frames)
+        except Exception:  # StopIteration at end of stream, av errors on corrupt data
+            return False, image
+        array = frame.to_ndarray(format=self.pixel_format, width=self.width, height=self.height)
+        if image is not None and image.shape == array.shape:
+            np.copyto(image, array)
+            return True, image
+        return True, array
+
+    def grab(self):
+        try:
+            next(self.frames)
+            return True
+        except Exception:  # StopIteration at end of stream, av errors on corrupt data
+            return False
+
+    def set_position(self, frame_index):
+        if self.fps:
+            self.container.seek(int(frame_index / self.fps / self.stream.time_base), stream=self.stream)
+            self.frames = self.container.decode(self.stream)
+
+    def set_output_size(self, size):
+        # Applied by to_ndarray's reformatter from the next frame on
+        self.width, self.height = size
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+BACKENDS = {
+    "opencv": OpenCVDecoder,
+    "ffmpeg": FFmpegPipeDecoder,
+    "pyav": PyAVDecoder,
+}
+
+
+def available_backends():
+    names = ["opencv"]
+    if shutil.which("ffmpeg") and shutil.which("ffprobe"):
+        names.append("ffmpeg")
+    try:
+        import av  # noqa: F401
+        names.append("pyav")
+    except ImportError:
+        pass
+    return names
+
+
+def open_decoder(path, backend=None, threads=None, size=None, pixel_format="bgr24", native_size=None):
+    # native_size is only applied by backends that scale inside the decoder; callers that
+    # resize anyway (the player) use it to avoid a second resize on the OpenCV backend
+    config = load_decoder_config()
+    backend = backend or config.get("backend", "opencv")
+    threads = config.get("threads", 0) if threads is None else threads
+    if backend not in available_backends():
+        print(f"[DECODER] Backend '{backend}' not available, falling back to OpenCV")
+        backend = "opencv"
+    decoder_class = BACKENDS[backend]
+    if size is None and native_size is not None and decoder_class.native_scaling:
+        size = native_size
+    return decoder_class(path, threads=threads, size=size, pixel_format=pixel_format)
+
+
+def benchmark(folder=VIDEO_FOLDER, backends=None, seconds=10.0, threads=None, size=None):
+    backends = backends or available_backends()
+    files = sorted(f for f in os.listdir(folder) if f.lower().endswith((".mp4", ".avi")))
+    if not files:
+        print(f"No videos found in {folder}")
+        return []
+
+    results = []
+    for file in files:
+        for backend in backends:
+            path = os.path.join(folder, file)
+            try:
+                decoder = open_decoder(path, backend=backend, threads=threads, size=size)
+            except Exception as e:
+                print(f"{file:<40}{backend:<8} failed to open: {e}")
+                continue
+            frames = 0
+            image = None
+            start = time.perf_counter()
+            while time.perf_counter() - start < seconds:
+                ret, image = decoder.read(image)
+                if not ret:
+                    break
+                frames += 1
+            elapsed = time.perf_counter() - start
+            decoder.release()
+            fps = frames / elapsed if elapsed > 0 else 0.0
+            results.append((file, backend, frames, fps))
+            print(f"{file:<40}{backend:<8}{frames:>7} frames {fps:>8.1f} fps")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--benchmark", action="store_true", help="report sustained decode fps per backend and file")
+    parser.add_argument("--folder", default=VIDEO_FOLDER)
+    parser.add_argument("--backends", help="comma-separated, default: every available backend")
+    parser.add_argument("--seconds", type=float, default=10.0, help="decode time per file and backend")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--size", help="output WIDTHxHEIGHT, e.g. 1280x720")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        size = tuple(int(v) for v in args.size.lower().split("x")) if args.size else None
+        benchmark(args.folder, args.backends.split(",") if args.backends else None, args.seconds, args.threads, size)
+    else:
+        parser.print_help()
@@ -3,6 +3,12 @@ import asyncio
 import time
 import platform
 from ghost_runner_hud import GhostRunnerHUD
+from hud_layers import HudCompositor, ExitDialog
+from frame_prefetcher import FramePrefetcher
+from presentation_clock import PresentationClock, DistanceLockedClock
+from playback_quality import QualityController
+from video_decoder import open_decoder
+from video_playlist import PlaylistCapture
 
 def get_screen_resolution():
     if platform.system() == "Windows":
@@ -16,152 +22,265 @@ def get_screen_resolution():
         print("Could not determine screen resolution:", e)
         return 1280, 720
 
-async def play_video(video_path, speed_ratio_queue, speed_queue, distance_queue, elapsed_time_queue, ghost_gap_queue, heart_rate_queue, exit_signal):
+def split_ghost_labels(ghost_gaps):
+    left_labels = []
+    right_labels = []
+    for name, gap in ghost_gaps.items():
+        gap_text = f"{name}: {'+' if gap >= 0 else ''}{gap:.1f} m"
+        if name.startswith("PB") or name.startswith("Goal"):
+            left_labels.append((gap, gap_text))
+        else:
+            right_labels.append((gap, gap_text))
+    left_labels.sort(key=lambda x: x[0], reverse=True)
+    right_labels.sort(key=lambda x: x[0], reverse=True)
+    return left_labels, right_labels
+
+def draw_hud(frame, hud, speed, heart_rate, distance_km, elapsed_seconds, left_labels, right_labels, race_position=None):
+    # Draws in place on the frame from cached tiles (see hud_layers.py)
+    frame_h, frame_w = frame.shape[:2]
+
+    # HUD: Speed
+    hud.draw_text(frame, f"{speed:.1f} km/h", (10, 30), 0.6, (255, 255, 255), 2)
+
+    # HUD: Heart Rate
+    if heart_rate is not None:
+        hud.draw_text(frame, f"HR: {heart_rate} bpm", (frame_w // 2, 30), 0.6, (255, 100, 100), 2, align="center")
+
+    # HUD: Race field placing
+    if race_position is not None:
+        position, field_size = race_position
+        hud.draw_text(frame, f"Position {position}/{field_size}", (frame_w // 2, 60), 0.6, (0, 255, 255), 2,
+                      align="center")
+
+    # HUD: Distance
+    distance_text = f"{distance_km:.2f} km"
+    distance_tile = hud.tile(distance_text, 0.6, (255, 255, 255), 2)
+    hud.draw_text(frame, distance_text, (frame_w - 10, distance_tile.text_height + 10),
+                  0.6, (255, 255, 255), 2, align="right")
+
+    # HUD: Elapsed Time
+    time_text = f"Time: {int(elapsed_seconds // 60)}:{int(elapsed_seconds % 60):02d}"
+    hud.draw_text(frame, time_text, (10, frame_h - 30), 0.6, (255, 255, 255), 2)
+
+    # HUD: Ghost Gaps (split left/right); sprites are drawn separately by GhostRunnerHUD
+    # Draw left-aligned labels (above time label)
+    y_offset_left = frame_h - 60  # 30 for time label + 30 buffer
+    for _, gap_text in left_labels:
+        hud.draw_text(frame, gap_text, (10, y_offset_left), 0.5, (0, 255, 255), 2)
+        y_offset_left -= 25
+
+    # Draw right-aligned labels
+    y_offset_right = frame_h - 30
+    for _, gap_text in right_labels:
+        hud.draw_text(frame, gap_text, (frame_w - 10, y_offset_right), 0.5, (0, 255, 255), 2, align="right")
+        y_offset_right -= 25
+
+def compose_frame(frame, hud, ghost_runner_hud, exit_dialog, speed, heart_rate, distance_km, elapsed_seconds,
+                  left_labels, right_labels, race_position, ghost_gaps, show_exit_dialog):
+    # Everything drawn onto a presented frame, in place; returns (hud_s, ghosts_s) for the trace.
+    # check_frame_allocations.py runs this same function
+    hud_start = time.perf_counter()
+    draw_hud(frame, hud, speed, heart_rate, distance_km, elapsed_seconds, left_labels, right_labels, race_position)
+    ghosts_start = time.perf_counter()
+    if ghost_gaps:
+        ghost_runner_hud.draw_ghost_runners(frame, ghost_gaps)
+    ghosts_end = time.perf_counter()
+
+    # Exit Confirmation Overlay
+    if show_exit_dialog:
+        exit_dialog.draw(frame)
+    return ghosts_start - hud_start, ghosts_end - ghosts_start
+
+async def play_video(video_path, speed_ratio_queue, speed_queue, distance_queue, elapsed_time_queue, ghost_snapshot, heart_rate_queue, exit_signal, route=None, trace=None, trace_path=None, adaptive_quality=True, playlist=None, stop_event=None, warm_start=None, motion=None):
 
-    cap = cv2.VideoCapture(video_path)
+    screen_width, screen_height = get_screen_resolution()
+
+    # Clips after the first are opened and primed in the background; frame indices run on across them
+    # warm_start is a capture already opened and primed by VideoWarmup while the menu was up
+    cap = PlaylistCapture(playlist or [video_path],
+                          lambda path: open_decoder(path, native_size=(screen_width, screen_height)),
+                          warm_start=warm_start)
     last_known_speed = 0.0
     last_known_distance = 0.0
+    last_known_hr = None
     elapsed_time_seconds = 0
-    last_ghost_gaps = {}
     speed_ratio = 1.0
     ghost_runner_hud = GhostRunnerHUD()
+    hud = HudCompositor()
+    exit_dialog = ExitDialog()
+    sorted_ghost_version = None
+    left_labels = []
+    right_labels = []
     confirm_exit = False
     esc_pressed_once = False
-
-    screen_width, screen_height = get_screen_resolution()
+    exit_requested = False
 
     # Create fullscreen window once
     cv2.namedWindow("Video", cv2.WINDOW_NORMAL)
     cv2.setWindowProperty("Video", cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+    fps = cap.fps or 15
 
+    # Decode + resize to screen resolution happen on a worker thread
+    prefetcher = FramePrefetcher(cap, (screen_width, screen_height))
+    prefetcher.start()
+
+    # With route data the frame follows metres run; otherwise it follows the speed ratio
+    if route is not None:
+        print(f"[VIDEO] Distance-locked playback over {route.total_distance_m:.0f} m of route data")
+        clock = DistanceLockedClock(route, fps, motion=motion)
+    else:
+        clock = PresentationClock(fps)
+    clock.start()
+    next_index = 0
+
+    quality = QualityController() if adaptive_quality else None
+
+    def drain_queues():
+        nonlocal speed_ratio, last_known_hr, last_known_speed, last_known_distance, elapsed_time_seconds
         try:
             speed_ratio = speed_ratio_queue.get_nowait()
+            clock.set_ratio(speed_ratio)
         except asyncio.QueueEmpty:
             pass
 
         try:
             last_known_hr = heart_rate_queue.get_nowait()
         except asyncio.QueueEmpty:
-            last_known_hr = None
+            pass
 
         try:
             last_known_speed = speed_queue.get_nowait()
+            if route is not None:
+                clock.set_speed(last_known_speed)
         except asyncio.QueueEmpty:
             pass
 
         try:
             last_known_distance = distance_queue.get_nowait()
+            if route is not None:
+                clock.set_distance(last_known_distance)
         except asyncio.QueueEmpty:
             pass
 
-        try:
-            last_ghost_gaps = ghost_gap_queue.get_nowait()
-        except asyncio.QueueEmpty:
-            pass
-
-        # HUD: Speed
-        hud_speed_text = f"{last_known_speed:.1f} km/h"
-        cv2.putText(frame, hud_speed_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-        # HUD: Heart Rate
-        if last_known_hr is not None:
-            hr_text = f"HR: {last_known_hr} bpm"
-            (text_width, text_height), _ = cv2.getTextSize(hr_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-            x_position = (frame.shape[1] - text_width) // 2
-            y_position = 30  # Top margin
-            cv2.putText(frame, hr_text, (x_position, y_position), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 100, 100), 2)
-
-
-
-        # HUD: Distance
-        hud_distance_text = f"{last_known_distance:.2f} km"
-        (text_width, text_height), _ = cv2.getTextSize(hud_distance_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-        cv2.putText(frame, hud_distance_text, (frame.shape[1] - text_width - 10, text_height + 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-        # HUD: Elapsed Time
         try:
             elapsed_time_seconds = elapsed_time_queue.get_nowait()
         except asyncio.QueueEmpty:
             pass
-        hud_time_text = f"Time: {int(elapsed_time_seconds // 60)}:{int(elapsed_time_seconds % 60):02d}"
-        cv2.putText(frame, hud_time_text, (10, frame.shape[0] - 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-        # HUD: Ghost Gaps (split left/right)
-        if last_ghost_gaps:
-            left_labels = []
-            right_labels = []
-
-            for name, gap in last_ghost_gaps.items():
-                if name.startswith("PB") or name.startswith("Goal"):
-                    left_labels.append((name, gap))
-                else:
-                    right_labels.append((name, gap))
-
-            
-            # Draw left-aligned labels (above time label)
-            y_offset_left = frame.shape[0] - 60  # 30 for time label + 30 buffer
-            for name, gap in sorted(left_labels, key=lambda x: x[1], reverse=True):
-                gap_text = f"{name}: {'+' if gap >= 0 else ''}{gap:.1f} m"
-                cv2.putText(frame, gap_text, (10, y_offset_left),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
-                y_offset_left -= 25
-
-
-
-            # Draw right-aligned labels
-            y_offset_right = frame.shape[0] - 30
-            for name, gap in sorted(right_labels, key=lambda x: x[1], reverse=True):
-                gap_text = f"{name}: {'+' if gap >= 0 else ''}{gap:.1f} m"
-                (text_width, _), _ = cv2.getTextSize(gap_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-                x_position = frame.shape[1] - text_width - 10
-                cv2.putText(frame, gap_text, (x_position, y_offset_right),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
-                y_offset_right -= 25
-
-            ghost_runner_hud.draw_ghost_runners(frame, last_ghost_gaps)
-
-
-        # Exit Confirmation Overlay
-        if confirm_exit:
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (200, 200), (600, 400), (0, 0, 0), -1)
-            cv2.putText(overlay, "Exit workout?", (250, 270), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
-            cv2.putText(overlay, "Y = Yes, ESC = No", (250, 320), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-            alpha = 0.7
-            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        # Resize to screen resolution
-        frame = cv2.resize(frame, (screen_width, screen_height))
-
-        # Show frame
-        cv2.imshow("Video", frame)
-        fps = cap.get(cv2.CAP_PROP_FPS) or 15
-
-        safe_ratio = max(speed_ratio, 0.1)  # prevent zero or too slow
-        key = cv2.waitKey(int(1000 / (fps * safe_ratio))) & 0xFF
 
 
+    def handle_key(key):
+        nonlocal confirm_exit, esc_pressed_once, exit_requested
         if not confirm_exit and key in [27, 8, 38]:  # ESC or BACK
             confirm_exit = True
             esc_pressed_once = True
         elif confirm_exit:
             if key in [ord('y'), ord('Y'), 13, 10]:  # Y or Enter
-                await exit_signal.put(True)
-                break
+                exit_requested = True
             elif key in [ord('n'), ord('N')]:
                 confirm_exit = False
             elif key in [27, 8, 38] and esc_pressed_once:
                 confirm_exit = False
                 esc_pressed_once = False
+        return exit_requested
+
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            break
+
+        queues_start = time.perf_counter()
+        drain_queues()
+        queues_time = time.perf_counter() - queues_start
+
+        item = prefetcher.get_nowait()
+        if item is None:
+            if prefetcher.exhausted:
+                break
+            clock.mark_starved(next_index)
+            # Keep the window pumping events so ESC still works while the decoder catches up
+            if handle_key(cv2.waitKey(1) & 0xFF):
+                await exit_signal.put(True)
+                break
+            await asyncio.sleep(0.005)  # Decoder hasn't caught up yet
+            continue
+        frame_index, frame, decode_time, resize_time = item
+        next_index = frame_index + 1
+
+        # Far behind the clock (belt sped up, or a distance jump): skip with grab()
+        target_index = int(clock.position())
+        if target_index - frame_index > prefetcher.buffer_size:
+            prefetcher.release(frame)
+            prefetcher.seek(target_index)
+            continue
+
+        if clock.should_drop(frame_index):
+            prefetcher.release(frame)
+            continue
+
+        # Only re-split and re-sort the ghost labels after the ghost ticker has published
+        if ghost_snapshot.version != sorted_ghost_version:
+            sorted_ghost_version = ghost_snapshot.version
+            left_labels, right_labels = split_ghost_labels(ghost_snapshot.gaps)
+
+        # Dead-reckoned between samples so the distance readout doesn't step once a second
+        shown_distance = motion.distance_at() / 1000 if motion is not None else last_known_distance
+
+        hud_time, ghosts_time = compose_frame(frame, hud, ghost_runner_hud, exit_dialog, last_known_speed,
+                                              last_known_hr, shown_distance, elapsed_time_seconds, left_labels,
+                                              right_labels, ghost_snapshot.race_position, ghost_snapshot.gaps,
+                                              confirm_exit)
+
+        # Sleep only what's left of this frame's budget, without blocking the loop
+        wait_start = time.perf_counter()
+        wait = clock.time_until(frame_index)
+        stopped = False
+        while wait > 0:
+            await asyncio.sleep(min(wait, clock.frame_interval))
+            # A distance-locked frame never comes due once samples stop or the belt stands still
+            if stop_event is not None and stop_event.is_set():
+                stopped = True
+                break
+            drain_queues()
+            if handle_key(cv2.waitKey(1) & 0xFF):
+                await exit_signal.put(True)
+                break
+            wait = clock.time_until(frame_index)
+        if exit_requested or stopped:
+            prefetcher.release(frame)
+            break
+
+        # Show frame; imshow copies it, so the slot can go straight back to the decoder
+        imshow_start = time.perf_counter()
+        cv2.imshow("Video", frame)
+        imshow_end = time.perf_counter()
+        prefetcher.release(frame)
+        clock.mark_presented(frame_index)
+
+        if quality is not None:
+            busy_time = queues_time + hud_time + ghosts_time + (imshow_end - imshow_start)
+            frame_budget = clock.frame_interval / max(speed_ratio, 0.1)
+            settings = quality.observe(busy_time, decode_time + resize_time, frame_budget,
+                                       clock.drift > clock.frame_interval)
+            if settings is not None:
+                prefetcher.set_quality(settings["interpolation"], settings["render_scale"], settings["frame_step"])
+                ghost_runner_hud.animate = settings["animate_sprites"]
+
+        if trace is not None:
+            trace.record(frame_index, decode=decode_time, resize=resize_time, queues=queues_time,
+                         hud=hud_time, ghosts=ghosts_time,
+                         imshow=imshow_end - imshow_start, wait=imshow_start - wait_start,
+                         lateness=clock.drift, speed_ratio=speed_ratio)
+        if handle_key(cv2.waitKey(1) & 0xFF):
+            await exit_signal.put(True)
+            break
 
         await asyncio.sleep(0)
 
-    cap.release()
+    print(f"[VIDEO] Playback stats: {clock.stats()}")
+    if trace is not None:
+        trace.print_summary()
+        if trace_path:
+            trace.dump(trace_path)
+    # Joining the decoder (and any clip preload) can block, so it happens off the loop
+    await asyncio.get_running_loop().run_in_executor(None, prefetcher.close)
     cv2.destroyAllWindows()
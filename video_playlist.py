@@ -0,0 +1,302 @@
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from route_data import nominal_distance_km
+
+VIDEO_EXTENSIONS = (".mp4", ".avi")
+
+
+def chain_videos(video_path, names=None):
+    # Explicit list from the config, else every video in the folder in name order starting at video_path
+    folder = os.path.dirname(str(video_path))
+    if names:
+        return [str(video_path)] + [os.path.join(folder, name) for name in names
+                                    if os.path.join(folder, name) != str(video_path)]
+    files = sorted(f for f in os.listdir(folder or ".") if f.lower().endswith(VIDEO_EXTENSIONS))
+    paths = [os.path.join(folder, f) for f in files]
+    if str(video_path) not in paths:
+        return [str(video_path)] + paths
+    start = paths.index(str(video_path))
+    return paths[start:] + paths[:start]
+
+
+def build_playlist(video_path, config, target_km=None):
+    """
+    Returns the list of clips to play back to back.
+
+    "mode" is "single" (default), "loop" (the chosen video repeated) or
+    "chain" (the configured "videos", or the rest of the folder). Clips are
+    added until their nominal distances cover target_km * "coverage", capped
+    at "max_clips" so the list, and the route built from it, stays finite.
+    """
+    mode = config.get("mode", "single")
+    if mode == "loop":
+        cycle = [str(video_path)]
+    elif mode == "chain":
+        cycle = chain_videos(video_path, config.get("videos"))
+    else:
+        return [str(video_path)]
+
+    max_clips = config.get("max_clips", 20)
+    goal_km = target_km * config.get("coverage", 1.25) if target_km else None
+    playlist = []
+    covered_km = 0.0
+    for path in itertools.cycle(cycle):
+        playlist.append(path)
+        covered_km += nominal_distance_km(path) or 0.0
+        if len(playlist) >= max_clips:
+            break
+        if goal_km is None:
+            if mode == "chain" and len(playlist) >= len(cycle):
+                break
+        elif covered_km >= goal_km:
+            break
+    return playlist
+
+
+class ClipPreload:
+    """Opens a clip and decodes its first frames on a background thread."""
+
+    def __init__(self, path, open_clip, frames=4):
+        self.path = path
+        self.open_clip = open_clip
+        self.frame_target = frames
+        self.decoder = None
+        self.frames = deque()
+        self.error = None
+        self.discarded = False
+        self.done = False
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="ClipPreload", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self.decoder = self.open_clip(self.path)
+            for _ in range(self.frame_target):
+                if self.discarded:
+                    break
+                ret, frame = self.decoder.read()
+                if not ret:
+                    break
+                self.frames.append(frame)
+        except Exception as e:
+            self.error = e
+        with self.lock:
+            self.done = True
+            self._release_if_discarded()
+
+    def _release_if_discarded(self):
+        if self.discarded and self.decoder is not None:
+            self.decoder.release()
+            self.decoder = None
+            self.frames.clear()
+
+    def result(self):
+        self.thread.join()
+        if self.error is not None:
+            print(f"[PLAYLIST] Preloading {self.path} failed: {self.error}")
+        return self.decoder, self.frames
+
+    def discard(self):
+        # Don't wait for a slow open; whichever side finishes last releases the decoder
+        with self.lock:
+            self.discarded = True
+            if self.done:
+                self._release_if_discarded()
+
+
+class PlaylistCapture:
+    """
+    Presents a playlist as one continuous capture for FramePrefetcher.
+
+    Frame indices keep counting across clips. While a clip plays, the next
+    one is opened and its first frames decoded on a background thread, so
+    switching clips costs the decode thread no more than an ordinary frame.
+    """
+
+    def __init__(self, paths, open_clip, preload_seconds=10.0, preload_frames=4, warm_start=None):
+        self.paths = [str(path) for path in paths]
+        self.open_clip = open_clip
+        self.preload_seconds = preload_seconds
+        self.preload_frames = preload_frames
+
+        # warm_start is (decoder, first_frames) for the first clip, see VideoWarmup
+        self.clip = 0
+        self.current, pending = warm_start or (open_clip(self.paths[0]), ())
+        self.fps = self.current.fps
+        self.width = self.current.width
+        self.height = self.current.height
+        self.pending = deque(pending)
+        self.clip_position = 0
+        self.clip_starts = [0]
+        self.position = 0
+        self.preload = None
+        self.output_size = None  # Reduced decode size from set_output_size(), carried over to later clips
+
+    @property
+    def frame_count(self):
+        return self.current.frame_count
+
+    def isOpened(self):
+        return self.current is not None and self.current.isOpened()
+
+    def set_output_size(self, size):
+        self.output_size = tuple(size)
+        if hasattr(self.current, "set_output_size"):
+            self.current.set_output_size(self.output_size)
+
+    def _maybe_preload(self):
+        if self.preload is not None or self.clip + 1 >= len(self.paths):
+            return
+        lead_frames = int(self.preload_seconds * (self.fps or 15))
+        if self.current.frame_count <= 0 or self.clip_position >= self.current.frame_count - lead_frames:
+            self.preload = ClipPreload(self.paths[self.clip + 1], self.open_clip, self.preload_frames)
+
+    def _advance(self):
+        # Current clip ended: swap in the preloaded one (or open it now if preloading never started)
+        if self.clip + 1 >= len(self.paths):
+            return False
+        if self.preload is None:
+            # Ended before the lead point (short, truncated or overestimated clip)
+            self.preload = ClipPreload(self.paths[self.clip + 1], self.open_clip, self.preload_frames)
+        decoder, frames = self.preload.result()
+        self.preload = None
+        self.current.release()
+        self.clip += 1
+        if decoder is None or not decoder.isOpened():
+            print(f"[PLAYLIST] Could not open {self.paths[self.clip]}, skipping")
+            if decoder is not None:
+                decoder.release()
+            self.current = _EmptyClip()
+            return self._advance()
+        self.current = decoder
+        self.pending = frames
+        if self.output_size is not None and hasattr(decoder, "set_output_size"):
+            decoder.set_output_size(self.output_size)
+        if self.fps and decoder.fps and abs(decoder.fps - self.fps) > 0.5:
+            print(f"[PLAYLIST] {os.path.basename(self.paths[self.clip])} runs at {decoder.fps:.1f} fps, "
+                  f"playlist clock at {self.fps:.1f} fps")
+        self.clip_position = 0
+        self.clip_starts.append(self.position)
+        print(f"[PLAYLIST] Clip {self.clip + 1}/{len(self.paths)}: {os.path.basename(self.paths[self.clip])} "
+              f"from frame {self.position}")
+        return True
+
+    def read(self, image=None):
+        while True:
+            if self.pending:
+                frame = self.pending.popleft()
+                if image is not None and image.shape == frame.shape:
+                    np.copyto(image, frame)
+                    frame = image
+                self._count_frame()
+                return True, frame
+            ret, image = self.current.read(image)
+            if ret:
+                self._count_frame()
+                return True, image
+            if not self._advance():
+                return False, image
+
+    def grab(self):
+        while True:
+            if self.pending:
+                self.pending.popleft()
+                self._count_frame()
+                return True
+            if self.current.grab():
+                self._count_frame()
+                return True
+            if not self._advance():
+                return False
+
+    def _count_frame(self):
+        self.position += 1
+        self.clip_position += 1
+        self._maybe_preload()
+
+    def release(self):
+        if self.preload is not None:
+            decoder, _ = self.preload.result()
+            if decoder is not None:
+                decoder.release()
+            self.preload = None
+        if self.current is not None:
+            self.current.release()
+            self.current = None
+
+
+class VideoWarmup:
+    """
+    Speculatively opens the video focused in the selection menu and decodes
+    its first frame, so play_video can start from a warm capture.
+
+    focus() is cheap enough to call every menu frame; a warm-up only starts
+    once the same video has stayed focused for settle_seconds, and moving on
+    discards the previous one. Only the opened decoder and one frame are
+    held, since the menu can stay up for a long time on a small board.
+    """
+
+    def __init__(self, open_clip, settle_seconds=0.3):
+        self.open_clip = open_clip
+        self.settle_seconds = settle_seconds
+        self.focused = None
+        self.focused_since = 0.0
+        self.preload = None
+
+    def focus(self, path, now=None):
+        now = time.monotonic() if now is None else now
+        path = str(path)
+        if path != self.focused:
+            self.focused = path
+            self.focused_since = now
+            return
+        if self.preload is not None and self.preload.path == path:
+            return
+        if now - self.focused_since >= self.settle_seconds:
+            self.discard()
+            self.preload = ClipPreload(path, self.open_clip, frames=1)
+
+    def take(self, path):
+        # Returns (decoder, first_frames) if path is the warm video, else None; either way the warm-up is handed off
+        preload, self.preload = self.preload, None
+        if preload is None:
+            return None
+        if preload.path != str(path) or not preload.done:
+            # Called on the event loop: a warm-up still opening is dropped rather than waited for
+            preload.discard()
+            return None
+        decoder, frames = preload.result()
+        if decoder is None or not decoder.isOpened():
+            return None
+        print(f"[WARMUP] Starting from a warm capture with {len(frames)} frames decoded")
+        return decoder, frames
+
+    def discard(self):
+        if self.preload is not None:
+            self.preload.discard()
+            self.preload = None
+
+
+class _EmptyClip:
+    # Stands in for a clip that failed to open so _advance can move past it
+    fps = 0.0
+    frame_count = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        return False, image
+
+    def grab(self):
+        return False
+
+    def release(self):
+        pass
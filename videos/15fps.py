@@ -1,5 +1,9 @@
 import cv2
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from video_decoder import open_decoder  # noqa: E402
 
 # Settings
 TARGET_FPS = 15
@@ -7,34 +11,39 @@ INPUT_EXT = '.mp4'
 OUTPUT_FOLDER = '15fps'
 
 def convert_to_15fps(input_path, output_path):
-    cap = cv2.VideoCapture(input_path)
+    cap = open_decoder(input_path)
     if not cap.isOpened():
         print(f"❌ Error: Cannot open video file {input_path}")
         return
 
-    original_fps = cap.get(cv2.CAP_PROP_FPS)
+    original_fps = cap.fps
     frame_interval = int(round(original_fps / TARGET_FPS))
     if frame_interval <= 0:
         frame_interval = 1
 
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    width = cap.width
+    height = cap.height
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Keep MP4 format
 
     out = cv2.VideoWriter(output_path, fourcc, TARGET_FPS, (width, height))
 
     frame_count = 0
     written_count = 0
+    frame = None
 
     while True:
-        ret, frame = cap.read()
+        # Frames that won't be written are only grabbed, never converted
+        if frame_count % frame_interval != 0:
+            if not cap.grab():
+                break
+            frame_count += 1
+            continue
+
+        ret, frame = cap.read(frame)
         if not ret:
             break
-
-        if frame_count % frame_interval == 0:
-            out.write(frame)
-            written_count += 1
-
+        out.write(frame)
+        written_count += 1
         frame_count += 1
 
     cap.release()
@@ -1,5 +1,9 @@
-import os
 import cv2
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from video_decoder import open_decoder  # noqa: E402
 
 def convert_all_mp4_to_avi_opencv(folder=".", target_width=640, target_height=360, fps=15, overwrite=False):
     fourcc = cv2.VideoWriter_fourcc(*'MJPG')  # MJPG codec for avi
@@ -15,19 +19,19 @@ def convert_all_mp4_to_avi_opencv(folder=".", target_width=640, target_height=36
 
             print(f"🎞️ Converting: {filename} → {os.path.basename(output_path)}")
 
-            cap = cv2.VideoCapture(input_path)
+            cap = open_decoder(input_path, size=(target_width, target_height))
             if not cap.isOpened():
                 print(f"❌ Failed to open {input_path}")
                 continue
 
             out = cv2.VideoWriter(output_path, fourcc, fps, (target_width, target_height))
 
+            frame = None
             while True:
-                ret, frame = cap.read()
+                ret, frame = cap.read(frame)
                 if not ret:
                     break
-                frame_resized = cv2.resize(frame, (target_width, target_height))
-                out.write(frame_resized)
+                out.write(frame)
 
             cap.release()
             out.release()
@@ -1,5 +1,10 @@
 import cv2
 from pathlib import Path
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from video_decoder import open_decoder  # noqa: E402
 
 def generate_video_thumbnail(video_path, timestamp=1.0):
     """
@@ -16,17 +21,16 @@ def generate_video_thumbnail(video_path, timestamp=1.0):
         return
 
     # Open the video file
-    cap = cv2.VideoCapture(str(video_file))
+    cap = open_decoder(video_file)
     if not cap.isOpened():
         print(f"Error opening video file: {video_path}")
         return
 
     # Calculate the frame number at the specified timestamp
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_number = int(fps * timestamp)
+    frame_number = int(cap.fps * timestamp)
 
     # Set the video to the desired frame
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+    cap.set_position(frame_number)
 
     # Read the frame
     ret, frame = cap.read()
@@ -1,15 +1,17 @@
 import random
 from datetime import timedelta
+from ghost_profile import GhostProfile
 
-def generate_competitor_profiles(user_duration_min, user_avg_speed, num_competitors=3):
+def generate_competitor_profiles(user_duration_min, user_avg_speed, num_competitors=3, rng=None):
+    rng = rng or random.Random()
     strategies = ["even", "positive_split", "negative_split", "mid_surge", "random"]
     competitors = []
     for i in range(num_competitors):
-        variation = random.uniform(-0.025, 0.025)  # ±2.5% duration variation
+        variation = rng.uniform(-0.025, 0.025)  # ±2.5% duration variation
         comp_time = user_duration_min * (1 + variation)
         comp_avg_speed = user_avg_speed * (user_duration_min / comp_time)  # Maintain same distance
         print(f"A ghost time is: {comp_time:.2f} min, with expected average speed of: {comp_avg_speed:.2f} km\n")
-        strategy = random.choice(strategies)
+        strategy = rng.choice(strategies)
         competitors.append({
             "name": f"Ghost {chr(65+i)}",
             "duration_min": comp_time,
@@ -19,12 +21,14 @@ def generate_competitor_profiles(user_duration_min, user_avg_speed, num_competit
     return competitors
 
 def normalize_speed_profile(speed_profile, target_avg, segment_duration_sec):
+    # Scale against the same interpolated speed curve the ghost is replayed with (see ghost_profile.py)
     total_distance = compute_total_distance(speed_profile, segment_duration_sec)
     expected_distance = target_avg * (segment_duration_sec * len(speed_profile) / 3600.0)
     scale = expected_distance / total_distance
     return [(t, speed * scale) for t, speed in speed_profile]
 
-def generate_speed_profile(duration_min, avg_speed, strategy):
+def generate_speed_profile(duration_min, avg_speed, strategy, rng=None):
+    rng = rng or random.Random()
     segments = 10
     segment_duration = duration_min * 60 / segments
     speed_profile = []
@@ -46,26 +50,28 @@ def generate_speed_profile(duration_min, avg_speed, strategy):
             speed_profile.append((i * segment_duration, speed))
     elif strategy == "random":
         for i in range(segments):
-            speed = random.uniform(avg_speed * 0.8, avg_speed * 1.2)
+            speed = rng.uniform(avg_speed * 0.8, avg_speed * 1.2)
             speed_profile.append((i * segment_duration, speed))
 
     return normalize_speed_profile(speed_profile, avg_speed, segment_duration)
 
 def compute_total_distance(speed_profile, segment_duration_sec):
-    total = 0.0
-    for _, speed in speed_profile:
-        total += speed * (segment_duration_sec / 3600.0)  # Convert to km
-    return total
-
-def generate_competitors_with_profiles(user_duration_min, user_avg_speed, num_competitors=3):
-    competitors = generate_competitor_profiles(user_duration_min, user_avg_speed, num_competitors)
+    # Distance in km over the full duration, the last segment included
+    duration_sec = segment_duration_sec * len(speed_profile)
+    return GhostProfile(speed_profile).distance_at(duration_sec) / 1000.0
+
+def generate_competitors_with_profiles(user_duration_min, user_avg_speed, num_competitors=3, seed=None):
+    # One seeded generator for the whole field, so the same seed always gives the same ghosts
+    rng = random.Random(seed)
+    competitors = generate_competitor_profiles(user_duration_min, user_avg_speed, num_competitors, rng)
     for competitor in competitors:
         duration_min = competitor["duration_min"]
         strategy = competitor["strategy"]
         avg_speed = competitor["avg_speed"]
 
-        speed_profile = generate_speed_profile(duration_min, avg_speed, strategy)
+        speed_profile = generate_speed_profile(duration_min, avg_speed, strategy, rng)
         competitor["speed_profile"] = speed_profile
+        competitor["profile"] = GhostProfile(speed_profile)
 
         # ➕ Add time difference to name
         time_diff_sec = (duration_min - user_duration_min) * 60